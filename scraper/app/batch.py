@@ -0,0 +1,111 @@
+"""Batch scraping: many product URLs through a bounded pool of workers."""
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.cache import canonicalize_url
+from app.config import BATCH_CONCURRENCY
+from app.scraper import scrape_product
+
+
+def dedupe_urls(urls: List[str]) -> List[Tuple[int, str, List[int]]]:
+    """
+    Drop blank URLs and fold URLs that canonicalize to one already in the batch into
+    it, keeping the first spelling of each. Returns (position in `urls`, url, every
+    position in `urls` with that canonical URL) triples.
+    """
+    unique = []
+    seen = {}
+    for index, url in enumerate(urls):
+        url = url.strip()
+        if not url:
+            continue
+        key = canonicalize_url(url)
+        if key in seen:
+            seen[key].append(index)
+            continue
+        seen[key] = [index]
+        unique.append((index, url, seen[key]))
+    return unique
+
+
+def to_scrape_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape a scrape result like ScrapeResponse (first image only)."""
+    images = result.get("images") or []
+    return {
+        "title": result.get("title"),
+        "price": result.get("price"),
+        "currency": result.get("currency"),
+        "image": images[0] if images else None,
+        "description": result.get("description"),
+        "url": result["url"],
+    }
+
+
+def batch_item(index: int, indices: List[int], result: Dict[str, Any]) -> Dict[str, Any]:
+    """One batch entry: the product in ScrapeResponse shape plus success/error."""
+    item = {"index": index, "indices": indices, **to_scrape_response(result)}
+    if not result.get("success", True):
+        item.update(success=False, error=result.get("error") or "Scrape failed")
+    elif not result.get("price") or not result.get("title"):
+        item.update(success=False, error="Product info not found")
+    else:
+        item.update(success=True, error=None)
+    return item
+
+
+async def iter_batch(entries: List[Tuple[int, str, List[int]]], refresh: bool = False,
+                     concurrency: Optional[int] = None):
+    """
+    Scrape (index, url, indices) triples from dedupe_urls with at most `concurrency` scrapes in
+    flight and yield one batch entry per URL as soon as it finishes.
+    Unfinished scrapes are cancelled if the consumer stops early.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for entry in entries:
+        queue.put_nowait(entry)
+    done: asyncio.Queue = asyncio.Queue()
+    stopping = False
+
+    async def worker():
+        while True:
+            try:
+                index, url, indices = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                result = await scrape_product(url, refresh=refresh)
+            except asyncio.CancelledError:
+                if stopping:
+                    raise
+                # A shared scrape cancelled by the other callers waiting on it
+                result = {"success": False, "error": "Scrape cancelled", "url": url}
+            except Exception as e:
+                result = {"success": False, "error": str(e), "url": url}
+            done.put_nowait(batch_item(index, indices, result))
+
+    workers = [asyncio.ensure_future(worker())
+               for _ in range(min(concurrency or BATCH_CONCURRENCY, len(entries)))]
+    try:
+        for _ in range(len(entries)):
+            yield await done.get()
+    finally:
+        stopping = True
+        pending = [task for task in workers if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def scrape_batch(urls: List[str], refresh: bool = False,
+                       concurrency: Optional[int] = None) -> Dict[str, Any]:
+    """Scrape a batch of URLs and return every entry in request order."""
+    entries = dedupe_urls(urls)
+    items = [item async for item in iter_batch(entries, refresh, concurrency)]
+    items.sort(key=lambda item: item["index"])
+    return {
+        "results": items,
+        "submitted": len(urls),
+        "skipped": len(urls) - len(entries),
+        "succeeded": sum(1 for item in items if item["success"]),
+    }
@@ -0,0 +1,254 @@
+"""Scrape result cache: an in-memory LRU tier plus an optional SQLite tier shared across workers."""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from app.config import (
+    CACHE_ENABLED,
+    CACHE_MAX_ENTRIES,
+    CACHE_SUCCESS_TTL,
+    CACHE_FAILURE_TTL,
+    CACHE_DB_PATH,
+    CACHE_STALE_TTL,
+)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only track the visit and never change the page (plus any utm_*)
+TRACKING_PARAMS = {
+    "gclid", "gclsrc", "dclid", "fbclid", "msclkid", "yclid", "igshid", "srsltid",
+    "mc_cid", "mc_eid", "_ga", "_gl", "ref_src", "ref_url", "spm", "scm",
+}
+
+# Expired rows are swept from the SQLite tier after this many writes
+PRUNE_EVERY = 500
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so equivalent spellings share one cache key:
+    lower-case scheme and host, default port and fragment dropped,
+    empty path as "/", tracking parameters dropped and the rest sorted.
+    URLs too malformed to split (e.g. "http://[::1") are their own key.
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMS
+
+
+class ResponseCache:
+    """
+    Two-tier cache of scrape results.
+    Successful results live for success_ttl seconds and failures for failure_ttl,
+    so a broken page is retried soon while good pages skip network and parsing.
+    Expired successes are kept for another stale_ttl seconds together with their
+    HTTP validators (ETag, Last-Modified, body hash) so a re-scrape can revalidate
+    them instead of downloading and parsing the page again.
+    The SQLite tier can wait out other workers' writes, so it is read and written in a
+    thread (a lock serializes its one connection); the memory tier stays on the event loop.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, success_ttl: float = CACHE_SUCCESS_TTL,
+                 failure_ttl: float = CACHE_FAILURE_TTL, db_path: str = CACHE_DB_PATH,
+                 stale_ttl: float = CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.success_ttl = success_ttl
+        self.failure_ttl = failure_ttl
+        self.stale_ttl = stale_ttl
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any], Optional[Dict[str, str]]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = {"not_modified": 0, "unchanged": 0, "changed": 0, "unknown": 0}
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Open the SQLite tier on first use."""
+        if not self.db_path:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+            # WAL lets every uvicorn worker read while another one writes
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scrape_cache ("
+                " key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL,"
+                " validators TEXT, stale_until REAL NOT NULL DEFAULT 0)"
+            )
+            # Cache files written before validators were stored lack the last two columns
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(scrape_cache)")}
+            if "validators" not in columns:
+                self._db.execute("ALTER TABLE scrape_cache ADD COLUMN validators TEXT")
+            if "stale_until" not in columns:
+                self._db.execute("ALTER TABLE scrape_cache ADD COLUMN stale_until REAL NOT NULL DEFAULT 0")
+        return self._db
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a fresh cached result, or None on a miss."""
+        entry = await self._lookup(key)
+        now = time.time()
+        if entry is not None and entry[0] > now:
+            if entry[3] == "memory":
+                self.memory_hits += 1
+            else:
+                self.disk_hits += 1
+            return dict(entry[1])
+
+        self.misses += 1
+        return None
+
+    async def get_stale(self, key: str) -> Optional[Tuple[Dict[str, Any], Dict[str, str]]]:
+        """
+        Return a previous successful result and its validators, fresh or expired,
+        for a conditional re-scrape. None when nothing can be revalidated.
+        """
+        entry = await self._lookup(key)
+        if entry is None or not entry[2] or not entry[1].get("success"):
+            return None
+        return dict(entry[1]), entry[2]
+
+    async def _lookup(self, key: str):
+        """Find an entry in memory, then on disk. Returns (expires_at, result, validators, tier)."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, result, validators = entry
+            if expires_at > now or (validators and expires_at + self.stale_ttl > now):
+                self._entries.move_to_end(key)
+                return expires_at, result, validators, "memory"
+            del self._entries[key]
+
+        if not self.db_path:
+            return None
+        row = await asyncio.get_running_loop().run_in_executor(None, self._read, key, now)
+        if not row:
+            return None
+        result = json.loads(row[0])
+        validators = json.loads(row[2]) if row[2] else None
+        self._remember(key, row[1], result, validators)
+        return row[1], result, validators, "disk"
+
+    def _read(self, key: str, now: float) -> Optional[tuple]:
+        try:
+            with self._lock:
+                return self._connect().execute(
+                    "SELECT result, expires_at, validators FROM scrape_cache"
+                    " WHERE key = ? AND (expires_at > ? OR stale_until > ?)",
+                    (key, now, now),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Scrape cache read failed: {e}")
+            return None
+
+    async def set(self, key: str, result: Dict[str, Any], validators: Optional[Dict[str, str]] = None) -> None:
+        """Store a scrape result with the TTL for its outcome, plus the validators to revalidate it later."""
+        ttl = self.success_ttl if result.get("success") else self.failure_ttl
+        if ttl <= 0:
+            return
+        if not result.get("success"):
+            validators = None
+        expires_at = time.time() + ttl
+        stale_until = expires_at + self.stale_ttl if validators else expires_at
+        self._remember(key, expires_at, dict(result), validators)
+        if self.db_path:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, key, json.dumps(result), expires_at,
+                json.dumps(validators) if validators else None, stale_until)
+
+    def _write(self, key: str, result: str, expires_at: float, validators: Optional[str],
+               stale_until: float) -> None:
+        try:
+            with self._lock, self._connect() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO scrape_cache (key, result, expires_at, validators, stale_until)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (key, result, expires_at, validators, stale_until),
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    now = time.time()
+                    db.execute("DELETE FROM scrape_cache WHERE expires_at <= ? AND stale_until <= ?", (now, now))
+        except sqlite3.Error as e:
+            print(f"Scrape cache write failed: {e}")
+
+    def record_revalidation(self, outcome: str) -> None:
+        """
+        Count how a conditional re-scrape ended: not_modified, unchanged, changed, or
+        unknown when either body was cut short and the hashes can't be compared.
+        """
+        self.revalidations[outcome] = self.revalidations.get(outcome, 0) + 1
+
+    def _remember(self, key: str, expires_at: float, result: Dict[str, Any],
+                  validators: Optional[Dict[str, str]] = None) -> None:
+        """Put an entry in the memory tier, evicting the least recently used ones past the size bound."""
+        self._entries[key] = (expires_at, result, validators)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached result from both tiers."""
+        self._entries.clear()
+        with self._lock:
+            db = self._connect()
+            if db is not None:
+                with db:
+                    db.execute("DELETE FROM scrape_cache")
+
+    def close(self) -> None:
+        """Close the SQLite connection (the memory tier is kept)."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": CACHE_ENABLED,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "disk_tier": bool(self.db_path),
+            "revalidations": dict(self.revalidations),
+        }
+
+
+# Process-wide cache used by scrape_product
+scrape_cache = ResponseCache()
@@ -1,3 +1,5 @@
+import os
+
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64)...",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)...",
@@ -7,3 +9,117 @@ USER_AGENTS = [
 HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
 }
+
+# Shared HTTP client (connection pool owned by the FastAPI lifespan)
+HTTP_TIMEOUT = float(os.getenv("SCRAPER_HTTP_TIMEOUT", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("SCRAPER_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SCRAPER_HTTP_MAX_KEEPALIVE_CONNECTIONS", "40"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("SCRAPER_HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("SCRAPER_HTTP_MAX_CONNECTIONS_PER_HOST", "6"))
+# HTTP/2 needs the optional "h2" package (pip install "httpx[http2]")
+HTTP2_ENABLED = os.getenv("SCRAPER_HTTP2", "0") == "1"
+
+# HTML parser backend used by the extraction pipeline: "auto" picks the fastest installed
+# (lxml, then html.parser, then html5lib), or name any BeautifulSoup tree builder
+HTML_PARSER = os.getenv("SCRAPER_HTML_PARSER", "auto")
+
+# Where HTML parsing/extraction runs: "inline" (on the event loop), "thread" or "process".
+# "process" ships the raw page bytes to a pool of worker processes so parsing uses every core
+# and never blocks the event loop.
+EXTRACTION_EXECUTOR = os.getenv("SCRAPER_EXTRACTION_EXECUTOR", "inline")
+EXTRACTION_WORKERS = int(os.getenv("SCRAPER_EXTRACTION_WORKERS", str(os.cpu_count() or 2)))
+# Pages allowed to be queued or parsing at once; further pages wait for a free slot
+EXTRACTION_MAX_PENDING = int(os.getenv("SCRAPER_EXTRACTION_MAX_PENDING", str(EXTRACTION_WORKERS * 2)))
+
+# Scrape result cache (keyed on the canonicalized URL)
+CACHE_ENABLED = os.getenv("SCRAPER_CACHE", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("SCRAPER_CACHE_MAX_ENTRIES", "2048"))
+CACHE_SUCCESS_TTL = float(os.getenv("SCRAPER_CACHE_SUCCESS_TTL", "900"))
+CACHE_FAILURE_TTL = float(os.getenv("SCRAPER_CACHE_FAILURE_TTL", "60"))
+# How long an expired result (and its ETag/Last-Modified/body hash) is kept for conditional re-scrapes
+CACHE_STALE_TTL = float(os.getenv("SCRAPER_CACHE_STALE_TTL", str(7 * 24 * 3600)))
+# Optional SQLite file shared by every uvicorn worker on the host; empty keeps the cache in memory only
+CACHE_DB_PATH = os.getenv("SCRAPER_CACHE_DB", "")
+
+# Streaming page download: stop reading once title, price and image are known from the
+# meta tags / JSON-LD, and never buffer more than STREAM_MAX_BODY_BYTES of a page
+STREAM_EARLY_STOP = os.getenv("SCRAPER_STREAM_EARLY_STOP", "1") == "1"
+STREAM_MAX_BODY_BYTES = int(os.getenv("SCRAPER_STREAM_MAX_BODY_BYTES", str(5 * 1024 * 1024)))
+# The early-stop sniffer parses on the event loop, so it gives up after this many bytes
+# (or at the end of a <head> that held neither price nor image) and the rest is only downloaded
+STREAM_SNIFF_BYTES = int(os.getenv("SCRAPER_STREAM_SNIFF_BYTES", str(256 * 1024)))
+# Closing a response mid-body also closes its keep-alive connection, so an early stop reads
+# the rest anyway when at most this many bytes remain (or, without a Content-Length, arrive)
+STREAM_DRAIN_BYTES = int(os.getenv("SCRAPER_STREAM_DRAIN_BYTES", str(64 * 1024)))
+
+# Fetch scheduling: a global concurrency bound, per-host concurrency (HTTP_MAX_CONNECTIONS_PER_HOST)
+# and a per-host token bucket that slows down on 429/503, Retry-After and slow responses
+FETCH_MAX_CONCURRENCY = int(os.getenv("SCRAPER_FETCH_MAX_CONCURRENCY", str(HTTP_MAX_CONNECTIONS)))
+HOST_RATE = float(os.getenv("SCRAPER_HOST_RATE", "2"))  # requests per second per host
+HOST_BURST = int(os.getenv("SCRAPER_HOST_BURST", "4"))
+HOST_SLOW_LATENCY = float(os.getenv("SCRAPER_HOST_SLOW_LATENCY", "5"))  # seconds to first byte
+HOST_MAX_RETRIES = int(os.getenv("SCRAPER_HOST_MAX_RETRIES", "2"))
+HOST_MAX_RETRY_AFTER = float(os.getenv("SCRAPER_HOST_MAX_RETRY_AFTER", "30"))
+
+# Search result URL lists, cached per (query variant, region, start offset, page size)
+SEARCH_CACHE_TTL = float(os.getenv("SCRAPER_SEARCH_CACHE_TTL", "1800"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SCRAPER_SEARCH_CACHE_MAX_ENTRIES", "512"))
+# Fetch the next page of search results while the current batch is being scraped
+SEARCH_PREFETCH = os.getenv("SCRAPER_SEARCH_PREFETCH", "1") == "1"
+
+# Batch scraping (/scrape/batch): URLs accepted per request and scrapes run at once per batch
+BATCH_MAX_URLS = int(os.getenv("SCRAPER_BATCH_MAX_URLS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("SCRAPER_BATCH_CONCURRENCY", "16"))
+
+# Per-domain extraction profiles: after PROFILE_MIN_PAGES pages from a domain, stages that never
+# supplied a field are skipped and the winning gallery selector is tried first
+PROFILES_ENABLED = os.getenv("SCRAPER_PROFILES", "1") == "1"
+PROFILE_MIN_PAGES = int(os.getenv("SCRAPER_PROFILE_MIN_PAGES", "5"))
+# Every Nth page from a domain runs the full chain again (0 disables the recheck)
+PROFILE_RECHECK_EVERY = int(os.getenv("SCRAPER_PROFILE_RECHECK_EVERY", "50"))
+PROFILE_MAX_DOMAINS = int(os.getenv("SCRAPER_PROFILE_MAX_DOMAINS", "1024"))
+
+# Background price monitoring of tracked URLs (/monitor endpoints)
+MONITOR_ENABLED = os.getenv("SCRAPER_MONITOR", "1") == "1"
+# SQLite file holding the tracked URLs and the price change feed
+MONITOR_DB_PATH = os.getenv("SCRAPER_MONITOR_DB", "monitor.db")
+MONITOR_DEFAULT_INTERVAL = float(os.getenv("SCRAPER_MONITOR_INTERVAL", str(6 * 3600)))
+MONITOR_MIN_INTERVAL = float(os.getenv("SCRAPER_MONITOR_MIN_INTERVAL", "300"))
+# A price that keeps not changing is checked up to this many times less often
+MONITOR_MAX_BACKOFF = float(os.getenv("SCRAPER_MONITOR_MAX_BACKOFF", "8"))
+# Random extra delay on each next check, as a fraction of the delay
+MONITOR_JITTER = float(os.getenv("SCRAPER_MONITOR_JITTER", "0.1"))
+MONITOR_TICK = float(os.getenv("SCRAPER_MONITOR_TICK", "30"))  # seconds between queue polls
+MONITOR_BATCH_SIZE = int(os.getenv("SCRAPER_MONITOR_BATCH_SIZE", "20"))  # checks per tick
+MONITOR_PER_HOST = int(os.getenv("SCRAPER_MONITOR_PER_HOST", "2"))  # checks per host per tick
+MONITOR_LEASE = float(os.getenv("SCRAPER_MONITOR_LEASE", "300"))
+# Optional URL that receives every price change as a JSON POST
+MONITOR_WEBHOOK_URL = os.getenv("SCRAPER_MONITOR_WEBHOOK_URL", "")
+
+# Local product index of successful scrapes, used to answer repeat searches (search "mode")
+INDEX_ENABLED = os.getenv("SCRAPER_INDEX", "1") == "1"
+INDEX_DB_PATH = os.getenv("SCRAPER_INDEX_DB", "products.db")
+# Indexed products younger than this are served without a live scrape; defaults to the
+# scrape cache's success TTL so "auto" searches are never staler than a cached scrape
+INDEX_FRESH_TTL = float(os.getenv("SCRAPER_INDEX_FRESH_TTL", str(CACHE_SUCCESS_TTL)))
+# Products not re-scraped for this long are dropped from the index
+INDEX_MAX_AGE = float(os.getenv("SCRAPER_INDEX_MAX_AGE", str(30 * 24 * 3600)))
+
+# Load the lazily imported parser and search libraries in the background right after startup
+# (and start the extraction workers), so the first requests don't pay for it
+WARMUP_ENABLED = os.getenv("SCRAPER_WARMUP", "1") == "1"
+
+# Image probing: ranged GETs of the first bytes of each candidate image to read its size from the
+# JPEG/PNG/GIF/WebP header; images below IMAGE_MIN_SIZE pixels on either side are dropped
+IMAGE_PROBE_ENABLED = os.getenv("SCRAPER_IMAGE_PROBE", "0") == "1"
+IMAGE_PROBE_BYTES = int(os.getenv("SCRAPER_IMAGE_PROBE_BYTES", str(32 * 1024)))
+IMAGE_PROBE_MAX = int(os.getenv("SCRAPER_IMAGE_PROBE_MAX", "8"))  # candidates probed per product
+IMAGE_PROBE_CONCURRENCY = int(os.getenv("SCRAPER_IMAGE_PROBE_CONCURRENCY", "16"))
+IMAGE_PROBE_TIMEOUT = float(os.getenv("SCRAPER_IMAGE_PROBE_TIMEOUT", "3"))  # seconds per product
+IMAGE_PROBE_CACHE_ENTRIES = int(os.getenv("SCRAPER_IMAGE_PROBE_CACHE_ENTRIES", "8192"))
+IMAGE_MIN_SIZE = int(os.getenv("SCRAPER_IMAGE_MIN_SIZE", "100"))
+
+# Near-duplicate products in one search: titles at least this similar (Jaccard over word bigrams)
+# with prices within DEDUPE_PRICE_TOLERANCE (as a fraction) count as the same product
+DEDUPE_TITLE_SIMILARITY = float(os.getenv("SCRAPER_DEDUPE_TITLE_SIMILARITY", "0.8"))
+DEDUPE_PRICE_TOLERANCE = float(os.getenv("SCRAPER_DEDUPE_PRICE_TOLERANCE", "0.02"))
@@ -0,0 +1,116 @@
+"""Duplicate detection for search results: URL variants of one page, and one product listed twice."""
+import re
+from typing import Dict, Any, List, Optional, Set, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from app.cache import canonicalize_url
+from app.config import DEDUPE_TITLE_SIMILARITY, DEDUPE_PRICE_TOLERANCE
+
+# Host prefixes of mobile and AMP copies of a site
+VARIANT_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+
+# Query parameters that only switch a page to its AMP/mobile rendering
+VARIANT_PARAMS = {"amp", "outputtype", "usqp", "mobile"}
+
+# Path segments that mark an AMP copy ("/item/123/amp", "/amp/item/123")
+AMP_PATH_REGEX = re.compile(r"(?:^/amp(?=/)|/amp/?$|\.amp(?=\.html?$|$))", re.IGNORECASE)
+
+TITLE_TOKEN_REGEX = re.compile(r"\w+", re.UNICODE)
+
+
+def page_key(url: str) -> str:
+    """
+    Identity of the page behind a URL: the cache's canonical form (tracking parameters
+    already gone) with the scheme, www/m/amp host prefixes, AMP path markers and
+    AMP/mobile switches removed, so the desktop, mobile and AMP copies share one key.
+    """
+    key = canonicalize_url(url)
+    try:
+        parts = urlsplit(key)
+    except ValueError:
+        return key
+    host = parts.netloc
+    for prefix in VARIANT_HOST_PREFIXES:
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = AMP_PATH_REGEX.sub("", parts.path).rstrip("/") or "/"
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                       if k.lower() not in VARIANT_PARAMS])
+    return f"{host}{path}?{query}" if query else f"{host}{path}"
+
+
+def title_shingles(title: str) -> Set[str]:
+    """Word bigrams of a normalized title (single words for one-word titles)."""
+    words = TITLE_TOKEN_REGEX.findall(title.lower())
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def same_price(a: Optional[float], b: Optional[float], tolerance: float) -> bool:
+    if a is None or b is None:
+        return a is b
+    return abs(a - b) <= tolerance * max(abs(a), abs(b))
+
+
+class ResultDeduper:
+    """
+    Tracks what a search has already scheduled and returned.
+    URLs are compared by page_key (including the rel=canonical of pages already
+    returned); products by title shingle similarity plus price in the same currency.
+    """
+
+    def __init__(self, title_similarity: float = DEDUPE_TITLE_SIMILARITY,
+                 price_tolerance: float = DEDUPE_PRICE_TOLERANCE):
+        self.title_similarity = title_similarity
+        self.price_tolerance = price_tolerance
+        # Pages scraped (or being scraped) and pages returned, by page_key
+        self.scheduled: Set[str] = set()
+        self.returned: Set[str] = set()
+        # (title shingles, price, currency) of every product returned
+        self.products: List[Tuple[Set[str], Optional[float], Optional[str]]] = []
+        self.skipped_urls = 0
+        self.collapsed = 0
+
+    def claim_url(self, url: str) -> bool:
+        """True the first time a page is seen; False for a variant of one already scheduled or returned."""
+        key = page_key(url)
+        if key in self.scheduled:
+            self.skipped_urls += 1
+            return False
+        self.scheduled.add(key)
+        return True
+
+    def accept(self, result: Dict[str, Any]) -> bool:
+        """
+        Record a product unless it duplicates one already returned: the same page under
+        another URL (by rel=canonical), or a near-identical title at the same price.
+        """
+        keys = {page_key(result["url"])}
+        if result.get("canonical_url"):
+            keys.add(page_key(result["canonical_url"]))
+        if keys & self.returned:
+            self.collapsed += 1
+            return False
+
+        shingles = title_shingles(result.get("title") or "")
+        price = result.get("price")
+        currency = (result.get("currency") or "").upper() or None
+        for seen_shingles, seen_price, seen_currency in self.products:
+            if (currency == seen_currency and same_price(price, seen_price, self.price_tolerance)
+                    and jaccard(shingles, seen_shingles) >= self.title_similarity):
+                self.collapsed += 1
+                return False
+
+        # Later search pages linking to this page's canonical URL aren't scraped again
+        self.scheduled.update(keys)
+        self.returned.update(keys)
+        self.products.append((shingles, price, currency))
+        return True
@@ -0,0 +1,117 @@
+"""CPU executor that keeps HTML parsing and extraction off the event loop."""
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+
+from app.config import EXTRACTION_EXECUTOR, EXTRACTION_WORKERS, EXTRACTION_MAX_PENDING
+from app.extraction import extract_product, warm_up
+from app.metrics import timed
+
+EXECUTOR_MODES = ("inline", "thread", "process")
+
+_pool: Optional[Executor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_in_flight = 0
+_waiting = 0
+
+
+def create_pool() -> Optional[Executor]:
+    """Build the worker pool for the configured mode ("inline" needs none)."""
+    if EXTRACTION_EXECUTOR not in EXECUTOR_MODES:
+        raise ValueError(f"Unknown extraction executor mode: {EXTRACTION_EXECUTOR}")
+    if EXTRACTION_EXECUTOR == "process":
+        # spawn, not fork: forking a process that already runs an event loop and threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    if EXTRACTION_EXECUTOR == "thread":
+        return ThreadPoolExecutor(max_workers=EXTRACTION_WORKERS, thread_name_prefix="extract")
+    return None
+
+
+def start_executor() -> None:
+    """Start the worker pool. Called from the app lifespan."""
+    global _pool
+    if _pool is None:
+        _pool = create_pool()
+
+
+def shutdown_executor() -> None:
+    """Stop the worker pool, cancelling pages that have not started parsing."""
+    global _pool, _slots
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _slots = None
+
+
+def replace_pool(broken: Executor) -> None:
+    """Swap a broken pool for a fresh one, unless another caller already did."""
+    global _pool
+    if _pool is broken:
+        broken.shutdown(wait=False, cancel_futures=True)
+        _pool = create_pool()
+
+
+def executor_stats() -> Dict[str, Any]:
+    """Current executor load, for monitoring backpressure."""
+    return {
+        "mode": EXTRACTION_EXECUTOR,
+        "workers": EXTRACTION_WORKERS if EXTRACTION_EXECUTOR != "inline" else 0,
+        "max_pending": EXTRACTION_MAX_PENDING,
+        "in_flight": _in_flight,
+        "waiting": _waiting,
+    }
+
+
+async def warm_up_executor() -> None:
+    """Load the parser stack wherever pages are parsed: this process, or every pool worker."""
+    loop = asyncio.get_running_loop()
+    pool = _pool
+    if pool is None:
+        # Inline mode parses on the event loop thread; importing in a thread still saves the first request
+        await loop.run_in_executor(None, warm_up)
+        return
+    # One task per worker; the process pool starts a worker for each while none are idle
+    await asyncio.gather(*(loop.run_in_executor(pool, warm_up) for _ in range(EXTRACTION_WORKERS)))
+
+
+async def run_extraction(content: bytes, url: str, encoding: Optional[str] = None,
+                         profile: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    Parse a page and extract the product fields using the configured executor.
+    At most EXTRACTION_MAX_PENDING pages are handed to the pool at once; callers
+    beyond that wait here, which pushes back on the fetchers instead of letting
+    raw pages pile up in the pool's queue.
+    """
+    global _slots, _in_flight, _waiting
+    if EXTRACTION_EXECUTOR == "inline":
+        return extract_product(content, url, encoding=encoding, profile=profile)
+
+    start_executor()
+    if _slots is None:
+        _slots = asyncio.Semaphore(EXTRACTION_MAX_PENDING)
+
+    slots = _slots
+    _waiting += 1
+    try:
+        with timed("executor_wait"):
+            await slots.acquire()
+    finally:
+        _waiting -= 1
+    _in_flight += 1
+    pool = _pool
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, extract_product, content, url, None, encoding, profile)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); replace the pool so later pages still parse
+        print(f"Extraction worker crashed while parsing {url}, restarting the pool")
+        replace_pool(pool)
+        raise
+    finally:
+        _in_flight -= 1
+        slots.release()
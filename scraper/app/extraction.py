@@ -0,0 +1,566 @@
+import json
+import re
+import time
+from functools import cached_property
+from itertools import chain
+from typing import Dict, List, Any, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from app.config import HTML_PARSER
+from app.prices import PriceScan
+from app.textnodes import iter_text_windows, text_prefix
+
+# Enhanced list of currency symbols and currency codes that can appear in prices
+CURRENCY_SYMBOLS = ["$", "₹", "£", "€", "Rs.", "Rs", "PKR", "USD", "₨"]
+
+# Minimum price threshold for laptops (to avoid false positives)
+MINIMUM_PRICE_THRESHOLD = 50
+
+# Images kept per product. Extraction returns every candidate; the scraper cuts the
+# list down after image probing has ranked it
+MAX_PRODUCT_IMAGES = 5
+
+# Longest description taken from a page's text (meta and structured descriptions are kept whole)
+DESCRIPTION_MAX_CHARS = 5000
+
+# BeautifulSoup tree builders in order of preference, fastest first
+PARSER_BACKENDS = ["lxml", "html.parser", "html5lib"]
+
+# Elements whose microdata value lives in an attribute rather than in their text
+MICRODATA_URL_ATTRS = {
+    "audio": "src", "embed": "src", "iframe": "src", "img": "src", "source": "src",
+    "track": "src", "video": "src", "a": "href", "area": "href", "link": "href",
+    "object": "data",
+}
+MICRODATA_VALUE_ATTRS = {"data": "value", "meter": "value", "time": "datetime"}
+
+# Extraction stages in chain order; a domain profile may skip the ones that never pay off
+EXTRACTION_STAGES = ["structured", "meta", "dom_price", "images", "description"]
+
+# Product image gallery selectors, tried in order
+GALLERY_SELECTORS = [
+    '.product-gallery img', '.product-image img', '.product img',
+    '[id*="product"] img', '[class*="product"] img',
+    '[id*="gallery"] img', '[class*="gallery"] img',
+    '[id*="slider"] img', '[class*="slider"] img',
+    'figure img', '.item-image img'
+]
+
+# Minimal product page run through the whole chain by warm_up()
+WARM_UP_PAGE = (
+    '<html><head><title>Warm-up</title><script type="application/ld+json">'
+    '{"@type": "Product", "name": "Warm-up"}</script></head>'
+    '<body><div class="product"><img src="/a.jpg"></div><p>Price: $100.00</p></body></html>'
+)
+
+# Open Graph / product meta tags and the product field each one fills
+META_MAPPINGS = {
+    "og:title": "title",
+    "og:description": "description",
+    "og:image": "image",
+    "og:price:amount": "price",
+    "product:price:amount": "price",
+    "og:price:currency": "currency",
+    "product:price:currency": "currency",
+    "twitter:image": "image"
+}
+
+def available_parsers() -> List[str]:
+    """List the parser backends that are installed, fastest first."""
+    # bs4 (and lxml behind it) is imported on the first parse, not when a worker boots
+    from bs4.builder import builder_registry
+    return [name for name in PARSER_BACKENDS if builder_registry.lookup(name)]
+
+def resolve_parser(parser: Optional[str] = None) -> str:
+    """
+    Pick the parser backend to use.
+    "auto" (the default) selects the fastest installed backend; any other name
+    must be a tree builder BeautifulSoup knows about.
+    """
+    from bs4.builder import builder_registry
+    parser = parser or HTML_PARSER
+    if parser == "auto":
+        installed = available_parsers()
+        return installed[0] if installed else "html.parser"
+    if not builder_registry.lookup(parser):
+        raise ValueError(f"HTML parser backend not available: {parser}")
+    return parser
+
+class ParsedPage:
+    """A product page parsed once. Every extraction step reads from this shared tree."""
+
+    def __init__(self, html: Union[str, bytes], url: str, parser: Optional[str] = None,
+                 encoding: Optional[str] = None):
+        from bs4 import BeautifulSoup
+        self.url = url
+        self.parser = resolve_parser(parser)
+        if isinstance(html, bytes):
+            # Let BeautifulSoup sniff <meta charset> when the server sent no charset
+            self.soup = BeautifulSoup(html, self.parser, from_encoding=encoding)
+        else:
+            self.soup = BeautifulSoup(html, self.parser)
+        self.base_url = self._find_base_url()
+
+    @property
+    def canonical_url(self) -> Optional[str]:
+        """The page's <link rel="canonical">, resolved against the base URL."""
+        link = self.soup.find("link", rel="canonical", href=True)
+        if link and link["href"].strip():
+            return urljoin_safe(self.base_url, link["href"].strip())
+        return None
+
+    def _find_base_url(self) -> str:
+        """Resolve the page's <base href>, falling back to the page URL."""
+        base = self.soup.find("base", href=True)
+        if base:
+            return urljoin_safe(self.url, base["href"].strip()) or self.url
+        return self.url
+
+    @property
+    def title(self) -> Optional[str]:
+        return self.soup.title.string if self.soup.title else "Unknown Title"
+
+    @cached_property
+    def price_scan(self) -> PriceScan:
+        """
+        Price candidates in the visible page text, shared by every price step. The text
+        is read window by window as the steps ask for it, never as one string.
+        """
+        return PriceScan(iter_text_windows(self.soup))
+
+def iter_json_ld(page: ParsedPage):
+    """Yield every JSON-LD object embedded in the page."""
+    for script in page.soup.find_all("script", type="application/ld+json"):
+        raw = script.string or script.get_text()
+        data = load_json_ld(raw)
+        if data is None:
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if not isinstance(item, dict):
+                continue
+            yield item
+            # Flattened graphs (@graph) nest the Product next to other nodes
+            for node in item.get("@graph") or []:
+                if isinstance(node, dict):
+                    yield node
+
+def load_json_ld(raw: Optional[str]):
+    """Parse a JSON-LD script body, tolerating HTML comments and CDATA wrappers."""
+    if not raw:
+        return None
+    raw = raw.strip()
+    try:
+        return json.loads(raw)
+    except ValueError:
+        pass
+    cleaned = re.sub(r'^\s*(?:<!--|<!\[CDATA\[)|(?:-->|\]\]>)\s*$', '', raw).strip()
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        return None
+
+def iter_microdata(page: ParsedPage):
+    """Yield the properties of every top-level microdata item in the page."""
+    for scope in page.soup.find_all(attrs={"itemscope": True}):
+        # Nested items are returned as a property value of their parent
+        if scope.has_attr("itemprop"):
+            continue
+        properties = microdata_properties(scope, page.base_url)
+        if properties:
+            yield properties
+
+def microdata_properties(scope, base_url: str) -> Dict[str, Any]:
+    """Collect the itemprop values that belong directly to an itemscope element."""
+    properties = {}
+    for el in scope.find_all(attrs={"itemprop": True}):
+        if owning_scope(el) is not scope:
+            continue
+        if el.has_attr("itemscope"):
+            value = microdata_properties(el, base_url)
+        else:
+            value = microdata_value(el, base_url)
+        for name in el["itemprop"].split():
+            # First value wins, like the structured-data readers below expect
+            properties.setdefault(name, value)
+    return properties
+
+def owning_scope(el):
+    """Return the closest itemscope ancestor of an itemprop element."""
+    for parent in el.parents:
+        if parent.has_attr("itemscope"):
+            return parent
+    return None
+
+def microdata_value(el, base_url: str) -> Optional[str]:
+    """Read the value of a non-item itemprop element."""
+    if el.get("content") is not None:
+        return el["content"]
+    if el.name in MICRODATA_URL_ATTRS:
+        value = el.get(MICRODATA_URL_ATTRS[el.name])
+        return urljoin_safe(base_url, value) if value else None
+    if el.name in MICRODATA_VALUE_ATTRS and el.get(MICRODATA_VALUE_ATTRS[el.name]) is not None:
+        return el[MICRODATA_VALUE_ATTRS[el.name]]
+    return el.get_text(" ", strip=True)
+
+def is_product_type(entry: dict) -> bool:
+    """Check the JSON-LD @type, which may be a string or a list of strings."""
+    types = entry.get("@type", "")
+    if isinstance(types, str):
+        types = [types]
+    return any(isinstance(t, str) and t.lower() == "product" for t in types)
+
+def extract_structured_data(page: ParsedPage) -> dict:
+    """Extract product information from structured data (JSON-LD or Microdata)."""
+    for entry in chain(iter_json_ld(page), iter_microdata(page)):
+        product = structured_product(entry)
+        if product is not None:
+            return product
+    return {}
+
+def structured_product(entry: dict) -> Optional[dict]:
+    """Read the product fields from one JSON-LD/microdata entry, or None if it is not a product."""
+    if not entry:
+        return None
+
+    # Check if it's a product or has product info
+    if not (is_product_type(entry) or "price" in entry or "offers" in entry):
+        return None
+
+    # Extract image from various possible locations
+    image = None
+    if "image" in entry:
+        image = entry["image"]
+        # Handle if image is a list or dict
+        if isinstance(image, list) and image:
+            image = image[0]
+        if isinstance(image, dict) and "url" in image:
+            image = image["url"]
+
+    # Extract price information
+    price = None
+    currency = None
+    if "offers" in entry:
+        offers = entry["offers"]
+        if isinstance(offers, dict):
+            price = safe_float(offers.get("price"))
+            currency = offers.get("priceCurrency")
+        elif isinstance(offers, list) and offers and isinstance(offers[0], dict):
+            price = safe_float(offers[0].get("price"))
+            currency = offers[0].get("priceCurrency")
+    elif "price" in entry:
+        price = safe_float(entry.get("price"))
+
+    return {
+        "title": entry.get("name"),
+        "price": price,
+        "currency": currency,
+        "image": image,
+        "description": entry.get("description"),
+    }
+
+def extract_meta_tags(page: ParsedPage) -> dict:
+    """Extract product information from meta tags."""
+    # Index the meta tags once instead of searching the tree for every mapping
+    by_property, by_name = {}, {}
+    for tag in page.soup.find_all("meta"):
+        if tag.get("property"):
+            by_property.setdefault(tag["property"], tag)
+        if tag.get("name"):
+            by_name.setdefault(tag["name"], tag)
+    out = {}
+    for prop, key in META_MAPPINGS.items():
+        tag = by_property.get(prop) or by_name.get(prop)
+        if tag and tag.get("content"):
+            out[key] = tag["content"]
+    if "price" in out:
+        out["price"] = safe_float(out["price"])
+    return out
+
+def extract_price_from_dom(page: ParsedPage) -> dict:
+    """Extract price from the DOM text, preferring amounts next to a price keyword."""
+    candidate = page.price_scan.best()
+    if candidate is None:
+        return {}
+    return {
+        "price": candidate.value,
+        "currency": candidate.currency or page.price_scan.page_currency() or "USD",
+    }
+
+def safe_float(val):
+    """Convert value to float, handling exceptions and formatting issues."""
+    if val is None:
+        return None
+    try:
+        if isinstance(val, str):
+            # Remove currency symbols and commas
+            for symbol in CURRENCY_SYMBOLS:
+                val = val.replace(symbol, "")
+            # Handle unicode decimal points or other separators
+            val = val.replace(",", "").strip()
+        return float(val)
+    except (ValueError, TypeError):
+        return None
+
+def extract_images(page: ParsedPage) -> List[str]:
+    """Extract product images from the page."""
+    return find_images(page)[0]
+
+def find_images(page: ParsedPage, preferred: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    Extract product images, along with the selector that found the first of them.
+    A `preferred` gallery selector (learned for the page's domain) is tried on its own first.
+    """
+    if preferred in GALLERY_SELECTORS:
+        images = gallery_images(page, preferred)
+        if images:
+            return list(dict.fromkeys(images)), preferred
+
+    soup = page.soup
+    images = []
+    source = None
+    base_url = page.base_url
+
+    # 1. Look for product image galleries
+    for selector in GALLERY_SELECTORS:
+        found = gallery_images(page, selector)
+        if found and source is None:
+            source = selector
+        images.extend(found)
+
+    # 2. If no gallery found, check for main product image
+    if not images:
+        main_img_selectors = [
+            'meta[property="og:image"]', 'meta[name="twitter:image"]',
+            '[id*="main-image"]', '[class*="main-image"]',
+            '[id*="featured-image"]', '[class*="featured-image"]',
+            '.product-image-main img', '.main-product-image'
+        ]
+
+        for selector in main_img_selectors:
+            elements = soup.select(selector)
+            if elements:
+                for el in elements:
+                    src = el.get('content') or el.get('src') or el.get('data-src')
+                    if src:
+                        abs_url = urljoin_safe(base_url, src)
+                        if abs_url:
+                            images.append(abs_url)
+                            source = source or selector
+                            break
+
+    # 3. Last resort: get any reasonably sized image
+    if not images:
+        for img in soup.find_all('img'):
+            src = img.get('src') or img.get('data-src')
+            if src and is_likely_product_image(src, img):
+                abs_url = urljoin_safe(base_url, src)
+                if abs_url:
+                    images.append(abs_url)
+                    source = source or "img"
+
+    # Remove duplicates while preserving order
+    return list(dict.fromkeys(images)), source
+
+def gallery_images(page: ParsedPage, selector: str) -> List[str]:
+    """Absolute URLs of the likely product images matched by one gallery selector."""
+    images = []
+    for img in page.soup.select(selector):
+        src = img.get('src') or img.get('data-src')
+        if src:
+            # Convert relative URLs to absolute
+            abs_url = urljoin_safe(page.base_url, src)
+            if abs_url and is_likely_product_image(abs_url, img):
+                images.append(abs_url)
+    return images
+
+def extract_description(page: ParsedPage) -> Optional[str]:
+    """Find a description in the usual description containers."""
+    desc_element = page.soup.select_one('[class*="description"], [id*="description"], meta[name="description"], [itemprop="description"]')
+    if desc_element:
+        if desc_element.name == "meta":
+            return desc_element.get('content', '')
+        return text_prefix(desc_element, DESCRIPTION_MAX_CHARS).strip()
+    return None
+
+def urljoin_safe(base: str, url: str) -> Optional[str]:
+    """Safely join base URL and relative URL."""
+    try:
+        return urljoin(base, url)
+    except Exception:
+        return url
+
+def is_likely_product_image(url: str, img_tag) -> bool:
+    """Check if an image is likely to be a product image."""
+    # Skip very small images, icons, or typical non-product images
+    skip_patterns = ['icon', 'logo', 'banner', 'sprite', 'tracking', 'pixel', 'button', 'transparent']
+
+    if any(pattern in url.lower() for pattern in skip_patterns):
+        return False
+
+    # Check image dimensions if available
+    width = img_tag.get('width')
+    height = img_tag.get('height')
+
+    if width and height:
+        try:
+            w, h = int(width), int(height)
+            # Skip very small images
+            if w < 100 or h < 100:
+                return False
+        except (ValueError, TypeError):
+            pass
+
+    return True
+
+def warm_up() -> None:
+    """Import the parser stack and run one tiny extraction so the first real page doesn't pay for it."""
+    extract_product(WARM_UP_PAGE, "http://localhost/")
+
+def extract_product(html: Union[str, bytes], url: str, parser: Optional[str] = None,
+                    encoding: Optional[str] = None, profile: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    Run every extraction step over a single parse of the page.
+    Accepts decoded text or the raw response bytes (with the charset from the
+    Content-Type header, if any). Returns the product fields; fetching and
+    error handling stay with the caller.
+    `profile` holds hints learned for the page's domain (see app.profiles): stages
+    to skip and a gallery selector to try first. If that shortcut finds no price or
+    no images, the full chain runs instead. The result carries a "trace" of the
+    stages that ran and the ones that supplied a field, for the profile to learn from,
+    with the method behind each field and the time spent in each stage (for app.metrics).
+    """
+    started = time.perf_counter()
+    page = ParsedPage(html, url, parser, encoding)
+    parse_seconds = time.perf_counter() - started
+
+    product, trace = extract_fields(page, profile)
+    if profile and (not product["price"] or not product["images"]):
+        shortcut_timings = trace["timings"]
+        product, trace = extract_fields(page)
+        trace["fallback"] = True
+        for stage, seconds in shortcut_timings.items():
+            trace["timings"][stage] = trace["timings"].get(stage, 0) + seconds
+
+    # Apply price validation (skip spuriously low prices)
+    started = time.perf_counter()
+    price = product["price"]
+    if price is not None and isinstance(price, (int, float)) and price < MINIMUM_PRICE_THRESHOLD:
+        # Look for another price in the page that's more reasonable
+        candidate = page.price_scan.first_currency_price(MINIMUM_PRICE_THRESHOLD)
+        if candidate:
+            product["price"] = candidate.value
+            trace["sources"]["price"] = "validate"
+    trace["timings"]["validate"] = time.perf_counter() - started
+    trace["timings"]["parse"] = parse_seconds
+
+    product["trace"] = trace
+    return product
+
+def extract_fields(page: ParsedPage, profile: Optional[dict] = None) -> Tuple[Dict[str, Any], dict]:
+    """Walk the extraction chain, skipping the stages the profile marks as dead."""
+    skip = set(profile.get("skip", ())) if profile else set()
+    trace = {
+        "ran": [],
+        "won": [],
+        "image_selector": None,
+        "fallback": False,
+        # Product field -> stage that supplied it
+        "sources": {},
+        # "extract_<stage>" -> seconds
+        "timings": {},
+    }
+
+    def ran(stage: str, started: float, supplied: List[str]) -> None:
+        trace["ran"].append(stage)
+        trace["timings"][f"extract_{stage}"] = time.perf_counter() - started
+        if supplied:
+            trace["won"].append(stage)
+            for field in supplied:
+                trace["sources"][field] = stage
+
+    # Extract basic product information
+    title = page.title
+    if title != "Unknown Title":
+        trace["sources"]["title"] = "title_tag"
+
+    # ---- PRODUCT EXTRACTION METHODS (Multiple sources) ----
+
+    price = None
+    currency = None
+    images = []
+    description = None
+
+    # METHOD 1: Extract from JSON-LD structured data
+    if "structured" not in skip:
+        started = time.perf_counter()
+        supplied = []
+        structured_data = extract_structured_data(page)
+        if structured_data:
+            if structured_data.get("price"):
+                price = structured_data.get("price")
+                currency = structured_data.get("currency")
+                supplied.append("price")
+            if structured_data.get("image"):
+                image_url = structured_data.get("image")
+                if isinstance(image_url, list):
+                    images.extend(image_url)
+                else:
+                    images.append(image_url)
+                supplied.append("images")
+            if structured_data.get("description"):
+                description = structured_data.get("description")
+                supplied.append("description")
+            if structured_data.get("title"):
+                title = structured_data.get("title")
+                supplied.append("title")
+        ran("structured", started, supplied)
+
+    # METHOD 2: Extract from meta tags
+    if "meta" not in skip and (not price or not images or not description):
+        started = time.perf_counter()
+        supplied = []
+        meta_data = extract_meta_tags(page)
+        if not price and meta_data.get("price"):
+            price = meta_data.get("price")
+            currency = meta_data.get("currency")
+            supplied.append("price")
+        if not images and meta_data.get("image"):
+            images.append(meta_data.get("image"))
+            supplied.append("images")
+        if not description and meta_data.get("description"):
+            description = meta_data.get("description")
+            supplied.append("description")
+        if not title and meta_data.get("title"):
+            title = meta_data.get("title")
+            supplied.append("title")
+        ran("meta", started, supplied)
+
+    # METHOD 3: Extract price from DOM
+    if "dom_price" not in skip and not price:
+        started = time.perf_counter()
+        dom_price_data = extract_price_from_dom(page)
+        if dom_price_data.get("price"):
+            price = dom_price_data.get("price")
+            currency = dom_price_data.get("currency")
+        ran("dom_price", started, ["price"] if price else [])
+
+    # METHOD 4: Extract images from DOM
+    if "images" not in skip and not images:
+        started = time.perf_counter()
+        images, trace["image_selector"] = find_images(page, profile.get("image_selector") if profile else None)
+        ran("images", started, ["images"] if images else [])
+
+    # METHOD 5: Find description if not found earlier
+    if "description" not in skip and not description:
+        started = time.perf_counter()
+        description = extract_description(page)
+        ran("description", started, ["description"] if description else [])
+
+    return {
+        "title": title,
+        "price": price,
+        "currency": currency,
+        "description": description,
+        "images": images or [],
+        "canonical_url": page.canonical_url,
+    }, trace
@@ -0,0 +1,85 @@
+"""Shared, pooled HTTP client used for every scraper fetch."""
+import random
+from typing import Dict, Optional
+
+import httpx
+
+from app.config import (
+    USER_AGENTS,
+    HTTP_TIMEOUT,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def browser_headers() -> Dict[str, str]:
+    """Headers sent with every page request, with a random user agent to avoid being blocked."""
+    return {
+        'User-Agent': random.choice(USER_AGENTS),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Referer': 'https://www.google.com/',
+        'DNT': '1',
+        'Upgrade-Insecure-Requests': '1',
+    }
+
+
+def http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_client() -> httpx.AsyncClient:
+    """Build an AsyncClient with the configured pool limits and keep-alive settings."""
+    http2 = HTTP2_ENABLED and http2_available()
+    if HTTP2_ENABLED and not http2:
+        print("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=HTTP_TIMEOUT,
+        limits=limits,
+        http2=http2,
+    )
+
+
+async def start_client() -> httpx.AsyncClient:
+    """Open the shared client. Called from the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client and drop its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the shared client.
+    Falls back to creating one lazily so the scraper still works outside the
+    FastAPI lifespan (scripts, REPL), in which case the caller should
+    await close_client() when done.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
@@ -0,0 +1,192 @@
+"""Image probing: read the first bytes of candidate images to learn their size, then drop and rank them."""
+import asyncio
+import struct
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.config import (
+    IMAGE_PROBE_BYTES,
+    IMAGE_PROBE_MAX,
+    IMAGE_PROBE_CONCURRENCY,
+    IMAGE_PROBE_TIMEOUT,
+    IMAGE_PROBE_CACHE_ENTRIES,
+    IMAGE_MIN_SIZE,
+)
+from app.http_client import browser_headers, get_client
+from app.metrics import timed
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, arithmetic...); DHT/JPG/DAC are not frames
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Probe outcome for an image that could not be fetched at all
+BROKEN = "broken"
+
+# Statuses that mean the image is gone for good; other failures may be transient
+GONE_STATUSES = {404, 410}
+
+
+def image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Width and height from the header of a JPEG, PNG, GIF or WebP file; None if not (yet) readable."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        if len(data) >= 24 and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])
+        return None
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        if len(data) >= 10:
+            return struct.unpack("<HH", data[6:10])
+        return None
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return webp_size(data)
+    if data[:2] == b"\xff\xd8":
+        return jpeg_size(data)
+    return None
+
+
+def webp_size(data: bytes) -> Optional[Tuple[int, int]]:
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        b0, b1, b2, b3 = data[21:25]
+        return 1 + (((b1 & 0x3F) << 8) | b0), 1 + (((b3 & 0x0F) << 10) | (b2 << 2) | ((b1 & 0xC0) >> 6))
+    if chunk == b"VP8X" and len(data) >= 30:
+        return 1 + int.from_bytes(data[24:27], "little"), 1 + int.from_bytes(data[27:30], "little")
+    return None
+
+
+def jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Walk the JPEG segments up to the start-of-frame, which holds the dimensions."""
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            # Markers without a length field
+            i += 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if marker in JPEG_SOF_MARKERS:
+            if i + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+class ImageProber:
+    """
+    Learns the size of candidate images from a ranged GET of their first bytes.
+    Probes run concurrently (at most `concurrency` across the process) within a
+    time budget per product, and outcomes are cached per URL.
+    """
+
+    def __init__(self, max_bytes: int = IMAGE_PROBE_BYTES, max_probes: int = IMAGE_PROBE_MAX,
+                 concurrency: int = IMAGE_PROBE_CONCURRENCY, timeout: float = IMAGE_PROBE_TIMEOUT,
+                 cache_entries: int = IMAGE_PROBE_CACHE_ENTRIES, min_size: int = IMAGE_MIN_SIZE):
+        self.max_bytes = max_bytes
+        self.max_probes = max_probes
+        self.timeout = timeout
+        self.cache_entries = cache_entries
+        self.min_size = min_size
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._concurrency = concurrency
+        # url -> (width, height), None (size unknown) or BROKEN
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+        self.probes = 0
+        self.cache_hits = 0
+        self.bytes_read = 0
+        self.dropped = 0
+
+    async def probe(self, url: str):
+        """
+        Size of one image, None if its format can't be read, BROKEN if it can't be fetched.
+        Only definite outcomes are cached: a timeout, connection error or 5xx is retried
+        by the next scrape instead of dropping the image for the life of the process.
+        """
+        if url in self._cache:
+            self._cache.move_to_end(url)
+            self.cache_hits += 1
+            return self._cache[url]
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+        outcome = None
+        definite = True
+        async with self._slots:
+            self.probes += 1
+            headers = browser_headers()
+            headers["Range"] = f"bytes=0-{self.max_bytes - 1}"
+            try:
+                async with get_client().stream("GET", url, headers=headers) as response:
+                    if response.status_code not in (200, 206):
+                        outcome = BROKEN
+                        definite = response.status_code in GONE_STATUSES
+                    else:
+                        data = b""
+                        # Servers that ignore Range send the whole file; stop once the header is in
+                        async for chunk in response.aiter_bytes():
+                            data += chunk
+                            outcome = image_size(data)
+                            if outcome is not None or len(data) >= self.max_bytes:
+                                break
+                        self.bytes_read += len(data)
+            except Exception:
+                outcome = BROKEN
+                definite = False
+
+        if definite:
+            self._cache[url] = outcome
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return outcome
+
+    async def rank(self, images: List[str]) -> List[str]:
+        """
+        Drop images that are smaller than min_size on either side or can't be fetched,
+        then order the rest largest first. Images whose size can't be read (other
+        formats, probes left over when the budget runs out) keep their order after them.
+        """
+        candidates = [url for url in images if url.startswith(("http://", "https://"))][:self.max_probes]
+        if not candidates:
+            return images
+
+        with timed("image_probe"):
+            tasks = {url: asyncio.ensure_future(self.probe(url)) for url in candidates}
+            done, pending = await asyncio.wait(tasks.values(), timeout=self.timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        sized, unknown = [], []
+        for position, url in enumerate(images):
+            task = tasks.get(url)
+            outcome = task.result() if task is not None and task in done else None
+            if outcome == BROKEN:
+                self.dropped += 1
+            elif outcome is None:
+                unknown.append(url)
+            elif min(outcome) < self.min_size:
+                self.dropped += 1
+            else:
+                sized.append((-(outcome[0] * outcome[1]), position, url))
+        return [url for _, _, url in sorted(sized)] + unknown
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "probes": self.probes,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "bytes_read": self.bytes_read,
+            "dropped": self.dropped,
+        }
+
+
+image_prober = ImageProber()
@@ -0,0 +1,176 @@
+"""Local product index: successful scrapes in SQLite with full-text search over title and description."""
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from app.config import INDEX_ENABLED, INDEX_DB_PATH, INDEX_FRESH_TTL, INDEX_MAX_AGE
+from app.extraction import MINIMUM_PRICE_THRESHOLD
+from app.ratelimit import host_of
+
+# Rows older than INDEX_MAX_AGE are swept after this many writes
+PRUNE_EVERY = 500
+
+# Search terms: runs of letters/digits
+TERM_REGEX = re.compile(r"\w+", re.UNICODE)
+
+PRODUCT_COLUMNS = ["url", "title", "description", "price", "currency", "images", "domain", "scraped_at"]
+
+
+class ProductIndex:
+    """
+    Every successful scrape, keyed on the canonical URL, with an FTS5 index over
+    title and description. Falls back to LIKE matching on SQLite builds without FTS5.
+    Calls block on SQLite (up to the busy timeout when other workers are writing),
+    so the scraper runs add() and search() in a thread; a lock serializes them.
+    """
+
+    def __init__(self, db_path: str = INDEX_DB_PATH, fresh_ttl: float = INDEX_FRESH_TTL,
+                 max_age: float = INDEX_MAX_AGE, enabled: bool = INDEX_ENABLED):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max_age
+        self.fts = False
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.queries = 0
+        self.served = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the index on first use."""
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path or ":memory:", timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                " key TEXT PRIMARY KEY, url TEXT NOT NULL, title TEXT, description TEXT,"
+                " price REAL, currency TEXT, images TEXT, domain TEXT, scraped_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS products_scraped_at ON products (scraped_at)")
+            try:
+                self._db.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+                    " title, description, content='products', tokenize='unicode61 remove_diacritics 2')"
+                )
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                print(f"SQLite FTS5 unavailable, product index falls back to LIKE search: {e}")
+        return self._db
+
+    def add(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store (or refresh) a successful scrape result under its canonical URL `key`, which
+        is also the URL served back, so the first caller's tracking parameters aren't.
+        """
+        if not result.get("success") or not result.get("title"):
+            return
+        now = time.time()
+        try:
+            with self._lock, self._connect() as db:
+                old = db.execute("SELECT rowid, title, description FROM products WHERE key = ?", (key,)).fetchone()
+                if old and self.fts:
+                    # External-content FTS rows are removed by giving back the indexed values
+                    db.execute(
+                        "INSERT INTO products_fts (products_fts, rowid, title, description)"
+                        " VALUES ('delete', ?, ?, ?)", old,
+                    )
+                db.execute(
+                    "INSERT OR REPLACE INTO products"
+                    " (key, url, title, description, price, currency, images, domain, scraped_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, key, result.get("title"), result.get("description"), result.get("price"),
+                     result.get("currency"), json.dumps(result.get("images") or []), host_of(key), now),
+                )
+                if self.fts:
+                    rowid = db.execute("SELECT rowid FROM products WHERE key = ?", (key,)).fetchone()[0]
+                    db.execute(
+                        "INSERT INTO products_fts (rowid, title, description) VALUES (?, ?, ?)",
+                        (rowid, result.get("title"), result.get("description")),
+                    )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(db, now)
+        except sqlite3.Error as e:
+            print(f"Product index write failed: {e}")
+
+    def _prune(self, db: sqlite3.Connection, now: float) -> None:
+        cutoff = now - self.max_age
+        if self.fts:
+            db.execute(
+                "INSERT INTO products_fts (products_fts, rowid, title, description)"
+                " SELECT 'delete', rowid, title, description FROM products WHERE scraped_at < ?", (cutoff,),
+            )
+        db.execute("DELETE FROM products WHERE scraped_at < ?", (cutoff,))
+
+    def search(self, query: str, limit: int, max_age: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Complete products (title, price above the minimum, at least one image) matching
+        every term of the query and scraped within max_age seconds, best match first.
+        """
+        terms = TERM_REGEX.findall(query.lower())
+        if not terms or limit <= 0:
+            return []
+        self.queries += 1
+        since = time.time() - (self.fresh_ttl if max_age is None else max_age)
+        columns = ", ".join(f"p.{c}" for c in PRODUCT_COLUMNS)
+        filters = "p.scraped_at >= ? AND p.price >= ? AND p.images != '[]'"
+        try:
+            with self._lock:
+                db = self._connect()
+                if self.fts:
+                    match = " AND ".join(f'"{term}"*' for term in terms)
+                    rows = db.execute(
+                        f"SELECT {columns} FROM products_fts JOIN products p ON p.rowid = products_fts.rowid"
+                        f" WHERE products_fts MATCH ? AND {filters} ORDER BY bm25(products_fts) LIMIT ?",
+                        (match, since, MINIMUM_PRICE_THRESHOLD, limit),
+                    ).fetchall()
+                else:
+                    likes = " AND ".join("(p.title LIKE ? OR p.description LIKE ?)" for _ in terms)
+                    params = [f"%{term}%" for term in terms for _ in range(2)]
+                    rows = db.execute(
+                        f"SELECT {columns} FROM products p WHERE {likes} AND {filters}"
+                        " ORDER BY p.scraped_at DESC LIMIT ?",
+                        (*params, since, MINIMUM_PRICE_THRESHOLD, limit),
+                    ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Product index search failed: {e}")
+            return []
+
+        results = []
+        for row in rows:
+            product = dict(zip(PRODUCT_COLUMNS, row))
+            product["images"] = json.loads(product["images"] or "[]")
+            del product["domain"]
+            results.append({**product, "success": True})
+        self.served += len(results)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        entries = domains = None
+        # A disabled index doesn't create its database just to report on it
+        if self.enabled or self._db is not None:
+            with self._lock:
+                entries, domains = self._connect().execute(
+                    "SELECT COUNT(*), COUNT(DISTINCT domain) FROM products").fetchone()
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "domains": domains,
+            "full_text": self.fts,
+            "queries": self.queries,
+            "served": self.served,
+        }
+
+
+product_index = ProductIndex()
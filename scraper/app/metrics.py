@@ -0,0 +1,180 @@
+"""In-process metrics: stage timings, counters and a Prometheus text exposition."""
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from app.ratelimit import host_of
+
+# Histogram buckets for stage timings, in seconds
+STAGE_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# Error counts are kept per domain for this many domains; the rest are counted as "other"
+MAX_ERROR_DOMAINS = 500
+
+# httpcore trace events (without the http11./http2./connection. prefix) -> stage name
+TRACE_STAGES = {
+    "connect_tcp": "connect",
+    "start_tls": "tls",
+    "receive_response_headers": "wait",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{format_labels(key)} {format_value(value)}" for key, value in self.values.items())
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: List[float] = STAGE_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # labels -> (per-bucket counts, sum, count)
+        self.values: Dict[Labels, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        counts, total, count = self.values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        self.values[key] = (counts, total + value, count + 1)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, total and mean per label set, for /stats."""
+        return {
+            ",".join(v for _, v in key) or "all": {
+                "count": count, "total_seconds": round(total, 4), "mean_seconds": round(total / count, 6),
+            }
+            for key, (_, total, count) in self.values.items()
+        }
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self.values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', format_value(bound)),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+
+def format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+stage_seconds = Histogram("scraper_stage_seconds", "Time spent in each scrape stage.")
+download_bytes = Counter("scraper_download_bytes_total", "Page body bytes read.")
+scrapes = Counter("scraper_scrapes_total", "Page fetches by outcome.")
+extraction_wins = Counter("scraper_extraction_wins_total", "Extraction method that supplied each product field.")
+errors = Counter("scraper_errors_total", "Failed fetches by domain and error class.")
+
+# Domains that have their own error series
+_error_domains = set()
+
+# Values owned by other components, read when /metrics is scraped: (name, help, type, collect)
+_collectors: List[Tuple[str, str, str, Callable[[], Dict[Labels, float]]]] = []
+
+
+def observe(stage: str, seconds: float) -> None:
+    stage_seconds.observe(seconds, stage=stage)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as one observation of `stage`, whether it finishes or raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def record_extraction(trace: Optional[dict]) -> None:
+    """Record the stage timings and winning methods an extraction trace carries back from the worker."""
+    if not trace:
+        return
+    for stage, seconds in trace.get("timings", {}).items():
+        observe(stage, seconds)
+    for field, method in trace.get("sources", {}).items():
+        extraction_wins.inc(field=field, method=method)
+
+
+def record_error(url: str, error_class: str) -> None:
+    domain = host_of(url) or "unknown"
+    if domain not in _error_domains:
+        if len(_error_domains) >= MAX_ERROR_DOMAINS:
+            domain = "other"
+        else:
+            _error_domains.add(domain)
+    errors.inc(domain=domain, error_class=error_class)
+    scrapes.inc(outcome="error")
+
+
+class ConnectionTracer:
+    """
+    httpx "trace" extension callback: times connection setup and the wait for the
+    response headers of one request. DNS resolution is part of "connect" because
+    httpcore resolves inside connect_tcp.
+    """
+
+    def __init__(self):
+        self._started: Dict[str, float] = {}
+
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        name, _, phase = event_name.rpartition(".")
+        stage = TRACE_STAGES.get(name.split(".", 1)[-1])
+        if stage is None:
+            return
+        if phase == "started":
+            self._started[stage] = time.perf_counter()
+        elif phase in ("complete", "failed") and stage in self._started:
+            observe(stage, time.perf_counter() - self._started.pop(stage))
+
+
+def register_collector(name: str, help_text: str, kind: str, collect: Callable[[], Dict[Labels, float]]) -> None:
+    """Expose values owned by another component (cache counters, pool sizes) under `name`."""
+    _collectors.append((name, help_text, kind, collect))
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in (stage_seconds, download_bytes, scrapes, extraction_wins, errors):
+        lines.extend(metric.render())
+    for name, help_text, kind, collect in _collectors:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in collect().items():
+            lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_summary() -> Dict[str, Any]:
+    """Compact view of the same numbers for /stats."""
+    return {
+        "stages": stage_seconds.summary(),
+        "extraction_wins": {",".join(v for _, v in key): value for key, value in extraction_wins.values.items()},
+        "errors": {",".join(v for _, v in key): value for key, value in errors.values.items()},
+    }
@@ -0,0 +1,323 @@
+"""Background price monitoring: a persistent queue of tracked URLs re-scraped on a schedule."""
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+from app.cache import canonicalize_url
+from app.config import (
+    MONITOR_ENABLED,
+    MONITOR_DB_PATH,
+    MONITOR_DEFAULT_INTERVAL,
+    MONITOR_MIN_INTERVAL,
+    MONITOR_MAX_BACKOFF,
+    MONITOR_JITTER,
+    MONITOR_TICK,
+    MONITOR_BATCH_SIZE,
+    MONITOR_PER_HOST,
+    MONITOR_LEASE,
+    MONITOR_WEBHOOK_URL,
+)
+from app.http_client import get_client
+from app.ratelimit import host_of
+from app.scraper import scrape_product
+
+# Prices closer than this are the same price
+PRICE_EPSILON = 0.005
+
+TRACKED_COLUMNS = [
+    "key", "url", "interval", "next_run", "last_run", "last_price", "last_currency",
+    "checks", "changes", "failures", "stable_checks", "added_at",
+]
+
+
+class PriceMonitor:
+    """
+    Re-scrapes tracked product URLs and records price changes.
+
+    Every URL has a base refresh interval. Each check that finds the same price doubles
+    the wait (up to MONITOR_MAX_BACKOFF times the interval) and a change resets it, so
+    products whose price moves are checked more often. Due URLs are taken in order of
+    how often their price has changed, at most MONITOR_PER_HOST per host per tick, and
+    every next run gets random jitter so one site's URLs don't all come due together.
+    Re-scrapes go through scrape_product(refresh=True), which revalidates the previous
+    result with ETag/Last-Modified/body hash instead of reparsing an unchanged page.
+    Rows are leased while checked, so several uvicorn workers can share one database.
+    SQLite calls can wait out other workers' writes, so the check loop runs them in a
+    thread (as do the endpoints); a lock serializes use of the one connection.
+    """
+
+    def __init__(self, db_path: str = MONITOR_DB_PATH, webhook_url: str = MONITOR_WEBHOOK_URL,
+                 enabled: bool = MONITOR_ENABLED):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.webhook_url = webhook_url
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop_ref: Optional[asyncio.AbstractEventLoop] = None
+        self._wake = asyncio.Event()
+        self.checked = 0
+        self.changed = 0
+        self.failed = 0
+        self.webhook_failures = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the queue database on first use."""
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path or ":memory:", timeout=5, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS tracked_urls ("
+                " key TEXT PRIMARY KEY, url TEXT NOT NULL, interval REAL NOT NULL,"
+                " next_run REAL NOT NULL, last_run REAL, last_price REAL, last_currency TEXT,"
+                " checks INTEGER NOT NULL DEFAULT 0, changes INTEGER NOT NULL DEFAULT 0,"
+                " failures INTEGER NOT NULL DEFAULT 0, stable_checks INTEGER NOT NULL DEFAULT 0,"
+                " added_at REAL NOT NULL, leased_until REAL NOT NULL DEFAULT 0)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS tracked_urls_next_run ON tracked_urls (next_run)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS price_changes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, url TEXT NOT NULL,"
+                " old_price REAL, new_price REAL, currency TEXT, changed_at REAL NOT NULL)"
+            )
+        return self._db
+
+    # ---- Tracked URLs ----
+
+    def track(self, urls: List[str], interval: Optional[float] = None) -> int:
+        """Start tracking URLs (or change their interval). The first check runs right away."""
+        interval = max(interval or MONITOR_DEFAULT_INTERVAL, MONITOR_MIN_INTERVAL)
+        now = time.time()
+        rows = OrderedDict()
+        for url in urls:
+            url = url.strip()
+            if url:
+                rows.setdefault(canonicalize_url(url), url)
+        with self._lock, self._connect() as db:
+            for key, url in rows.items():
+                db.execute(
+                    "INSERT INTO tracked_urls (key, url, interval, next_run, added_at) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET interval = excluded.interval,"
+                    " next_run = MIN(next_run, excluded.next_run + excluded.interval)",
+                    (key, url, interval, now, now),
+                )
+        self.wake()
+        return len(rows)
+
+    def wake(self) -> None:
+        """Run the check loop now instead of at the next tick; safe to call from any thread."""
+        if self._loop_ref is not None and self._task is not None and not self._task.done():
+            self._loop_ref.call_soon_threadsafe(self._wake.set)
+
+    def untrack(self, urls: List[str]) -> int:
+        with self._lock, self._connect() as db:
+            return sum(
+                db.execute("DELETE FROM tracked_urls WHERE key = ?", (canonicalize_url(url),)).rowcount
+                for url in urls if url.strip()
+            )
+
+    def tracked(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(TRACKED_COLUMNS)} FROM tracked_urls ORDER BY added_at, key LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        return [dict(zip(TRACKED_COLUMNS, row)) for row in rows]
+
+    def changes(self, since: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Price changes with an id above `since`, oldest first (poll with the last id seen)."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, url, old_price, new_price, currency, changed_at FROM price_changes"
+                " WHERE id > ? ORDER BY id LIMIT ?",
+                (since, limit),
+            ).fetchall()
+        return [
+            {"id": row[0], "url": row[1], "old_price": row[2], "new_price": row[3],
+             "currency": row[4], "changed_at": row[5]}
+            for row in rows
+        ]
+
+    # ---- Scheduling ----
+
+    def claim_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Lease the URLs to check this tick: due rows, most often changed first,
+        no more than MONITOR_PER_HOST per host and MONITOR_BATCH_SIZE in total.
+        """
+        now = now or time.time()
+        with self._lock:
+            return self._claim(self._connect(), now)
+
+    def _claim(self, db: sqlite3.Connection, now: float) -> List[Dict[str, Any]]:
+        rows = db.execute(
+            f"SELECT {', '.join(TRACKED_COLUMNS)} FROM tracked_urls"
+            " WHERE next_run <= ? AND leased_until <= ?"
+            " ORDER BY (changes + 1.0) / (checks + 2.0) DESC, next_run LIMIT ?",
+            (now, now, MONITOR_BATCH_SIZE * 4),
+        ).fetchall()
+
+        per_host: Dict[str, int] = {}
+        claimed = []
+        with db:
+            for row in rows:
+                item = dict(zip(TRACKED_COLUMNS, row))
+                host = host_of(item["url"])
+                if per_host.get(host, 0) >= MONITOR_PER_HOST:
+                    continue
+                # Another worker may have leased the row since the SELECT
+                leased = db.execute(
+                    "UPDATE tracked_urls SET leased_until = ? WHERE key = ? AND leased_until <= ?",
+                    (now + MONITOR_LEASE, item["key"], now),
+                ).rowcount
+                if not leased:
+                    continue
+                per_host[host] = per_host.get(host, 0) + 1
+                claimed.append(item)
+                if len(claimed) >= MONITOR_BATCH_SIZE:
+                    break
+        return claimed
+
+    def next_delay(self, item: Dict[str, Any], changed: bool) -> float:
+        """Seconds until the next check: the interval, backed off while the price holds, plus jitter."""
+        stable = 0 if changed else item["stable_checks"] + 1
+        delay = item["interval"] * min(2 ** stable, MONITOR_MAX_BACKOFF)
+        return delay + random.uniform(0, delay * MONITOR_JITTER)
+
+    async def check(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Re-scrape one tracked URL. Returns the price change, if there was one."""
+        result = await scrape_product(item["url"], refresh=True)
+        price = result.get("price") if result.get("success") else None
+        change = await asyncio.get_running_loop().run_in_executor(
+            None, self.record_check, item, price, result.get("currency"))
+        if change:
+            await self.notify(change)
+        return change
+
+    def record_check(self, item: Dict[str, Any], price: Optional[float],
+                     currency: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Store a check's outcome and schedule the next one. Returns the price change, if there was one."""
+        with self._lock:
+            return self._record(self._connect(), item, price, currency, time.time())
+
+    def _record(self, db: sqlite3.Connection, item: Dict[str, Any], price: Optional[float],
+                currency: Optional[str], now: float) -> Optional[Dict[str, Any]]:
+        self.checked += 1
+        if price is None:
+            self.failed += 1
+            with db:
+                db.execute(
+                    "UPDATE tracked_urls SET next_run = ?, last_run = ?, checks = checks + 1,"
+                    " failures = failures + 1, leased_until = 0 WHERE key = ?",
+                    (now + self.next_delay(item, False), now, item["key"]),
+                )
+            return None
+
+        old_price = item["last_price"]
+        changed = old_price is not None and (
+            abs(price - old_price) > PRICE_EPSILON or (currency or None) != (item["last_currency"] or None))
+        # The first price seen has nothing to be stable against, so it starts the backoff at zero
+        reset = changed or old_price is None
+        change = None
+        with db:
+            db.execute(
+                "UPDATE tracked_urls SET next_run = ?, last_run = ?, last_price = ?, last_currency = ?,"
+                " checks = checks + 1, changes = changes + ?, stable_checks = ?, leased_until = 0"
+                " WHERE key = ?",
+                (now + self.next_delay(item, reset), now, price, currency, int(changed),
+                 0 if reset else item["stable_checks"] + 1, item["key"]),
+            )
+            if changed:
+                cursor = db.execute(
+                    "INSERT INTO price_changes (key, url, old_price, new_price, currency, changed_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (item["key"], item["url"], old_price, price, currency, now),
+                )
+                change = {"id": cursor.lastrowid, "url": item["url"], "old_price": old_price,
+                          "new_price": price, "currency": currency, "changed_at": now}
+        if change:
+            self.changed += 1
+        return change
+
+    async def notify(self, change: Dict[str, Any]) -> None:
+        """POST a price change to the webhook, if one is configured. The change feed keeps it either way."""
+        if not self.webhook_url:
+            return
+        try:
+            response = await get_client().post(self.webhook_url, json=change)
+            response.raise_for_status()
+        except Exception as e:
+            self.webhook_failures += 1
+            print(f"Price change webhook failed for {change['url']}: {e}")
+
+    async def run_once(self) -> int:
+        """Check every URL claimed this tick concurrently. Returns how many were checked."""
+        due = await asyncio.get_running_loop().run_in_executor(None, self.claim_due)
+        if due:
+            outcomes = await asyncio.gather(*(self.check(item) for item in due), return_exceptions=True)
+            for item, outcome in zip(due, outcomes):
+                if isinstance(outcome, Exception):
+                    print(f"Price check failed for {item['url']}: {outcome}")
+        return len(due)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                checked = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Price monitor tick failed: {e}")
+                checked = 0
+            if checked:
+                # More may be due already; go again without waiting for the tick
+                await asyncio.sleep(0)
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), MONITOR_TICK)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._loop_ref = asyncio.get_running_loop()
+            self._task = self._loop_ref.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        tracked = due = None
+        # A disabled monitor doesn't create its database just to report on it
+        if self.enabled or self._db is not None:
+            with self._lock:
+                tracked, due = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(next_run <= ?), 0) FROM tracked_urls", (time.time(),)).fetchone()
+        return {
+            "enabled": self.enabled,
+            "running": self._task is not None and not self._task.done(),
+            "tracked": tracked,
+            "due": due,
+            "checked": self.checked,
+            "changed": self.changed,
+            "failed": self.failed,
+            "webhook": bool(self.webhook_url),
+            "webhook_failures": self.webhook_failures,
+        }
+
+
+price_monitor = PriceMonitor()
@@ -0,0 +1,186 @@
+"""Single-pass price and currency scanner for page text."""
+import re
+from typing import Iterable, List, Optional, Union
+
+# Price context keywords to improve extraction, strongest first.
+# Currency tokens also count as context, ranked after the words.
+PRICE_CONTEXT_KEYWORDS = [
+    "price", "cost", "total", "pay", "buy", "rs", "$", "₹", "£", "€", "₨", "pkr", "usd"
+]
+
+# Currency token (lower-cased, trailing "." dropped) -> ISO code
+CURRENCY_CODES = {
+    "$": "USD", "usd": "USD",
+    "₹": "INR",
+    "rs": "PKR", "pkr": "PKR", "₨": "PKR",
+    "£": "GBP",
+    "€": "EUR",
+}
+
+# Page-wide fallback order when no currency sits next to the price
+CURRENCY_PRIORITY = ["$", "usd", "₹", "rs", "pkr", "₨", "£", "€"]
+
+# Max characters (no digits) between a keyword/currency and the amount it labels
+CONTEXT_WINDOW = 15
+
+# Max characters between an amount and a currency written after it ("1,299 PKR")
+SUFFIX_WINDOW = 2
+
+# One automaton for every token the scanner cares about, compiled once at import
+TOKEN_REGEX = re.compile(
+    r'(?P<keyword>\b(?:price|cost|total|pay|buy))'
+    # "Rs." keeps its dot even before a space; codes may run straight into the amount ("Rs24,999")
+    r'|(?P<currency>[$€£₹₨]|\b(?:rs\.|(?:rs|pkr|usd)(?![a-z])))'
+    r'|(?P<amount>\d[\d,]*(?:\.\d{1,2})?)',
+    re.IGNORECASE
+)
+
+_CONTEXT_RANKS = {token: rank for rank, token in enumerate(PRICE_CONTEXT_KEYWORDS)}
+
+
+def currency_key(token: str) -> str:
+    return token.lower().rstrip(".")
+
+
+class PriceCandidate:
+    """An amount found in the text, with the context that labels it."""
+    __slots__ = ("value", "position", "rank", "currency", "prefixed")
+
+    def __init__(self, value: float, position: int, rank: Optional[int],
+                 currency: Optional[str], prefixed: bool):
+        self.value = value
+        self.position = position
+        # Index of the labelling keyword in PRICE_CONTEXT_KEYWORDS; None for unlabelled amounts
+        self.rank = rank
+        self.currency = currency
+        # Written right after a currency symbol/code ("$ 1,299", "Rs.1,299")
+        self.prefixed = prefixed
+
+
+class PriceScan:
+    """
+    Every price candidate and currency mention in a text, collected in one pass.
+    The text can also be given as an iterable of windows (consecutive pieces joined
+    by a space, never splitting a word, e.g. from app.textnodes.iter_text_windows);
+    windows are then only scanned as far as the questions asked need.
+    """
+
+    def __init__(self, text: Union[str, Iterable[str]]):
+        self.candidates: List[PriceCandidate] = []
+        self.currencies_seen = set()
+        self.exhausted = False
+        self._windows = iter([text] if isinstance(text, str) else text)
+        # Position of the next window in the joined text
+        self._offset = 0
+        # Keyword/currency tokens since the last amount: (rank, end position, currency key or None)
+        self._context = []
+        # (candidate, end position) of the last amount, for suffix currencies
+        self._last_amount = None
+        # Whether only whitespace follows the last token so far
+        self._blank_tail = False
+        # First amount labelled by the strongest keyword
+        self._strongest: Optional[PriceCandidate] = None
+
+    def _advance(self) -> bool:
+        """Scan the next window; False once the text is used up."""
+        window = next(self._windows, None)
+        if window is None:
+            self.exhausted = True
+            return False
+        self._scan(window, self._offset)
+        self._offset += len(window) + 1
+        return True
+
+    def _scan(self, text: str, offset: int) -> None:
+        previous_end = None  # end of the previous token in this window
+        for match in TOKEN_REGEX.finditer(text):
+            kind = match.lastgroup
+            token = match.group()
+            position = offset + match.start()
+            if previous_end is None:
+                gap_blank = self._blank_tail and not text[:match.start()].strip()
+            else:
+                gap_blank = not text[previous_end:match.start()].strip()
+            previous_end = match.end()
+
+            if kind == "amount":
+                try:
+                    value = float(token.replace(",", ""))
+                except ValueError:
+                    continue
+                candidate = self._label(value, position, self._context, gap_blank)
+                self.candidates.append(candidate)
+                if candidate.rank == 0 and self._strongest is None:
+                    self._strongest = candidate
+                self._last_amount = (candidate, offset + match.end())
+                # An amount ends the reach of the labels before it
+                self._context = []
+                continue
+
+            key = currency_key(token)
+            if kind == "currency":
+                self.currencies_seen.add(key)
+                last_amount = self._last_amount
+                if last_amount is not None and position - last_amount[1] <= SUFFIX_WINDOW:
+                    candidate = last_amount[0]
+                    candidate.currency = candidate.currency or CURRENCY_CODES[key]
+                    if candidate.rank is None:
+                        candidate.rank = len(PRICE_CONTEXT_KEYWORDS)
+                self._context.append((_CONTEXT_RANKS[key], offset + match.end(), key))
+            else:
+                self._context.append((_CONTEXT_RANKS[key], offset + match.end(), None))
+            self._last_amount = None
+
+        if previous_end is None:
+            self._blank_tail = self._blank_tail and not text.strip()
+        else:
+            self._blank_tail = not text[previous_end:].strip()
+
+    @staticmethod
+    def _label(value: float, position: int, context: list, gap_blank: bool) -> PriceCandidate:
+        """Attach the strongest label and the nearest currency within reach of an amount."""
+        in_reach = [c for c in context if position - c[1] <= CONTEXT_WINDOW]
+        if not in_reach:
+            return PriceCandidate(value, position, None, None, False)
+        rank = min(c[0] for c in in_reach)
+        currencies = [c for c in in_reach if c[2] is not None]
+        currency = CURRENCY_CODES[currencies[-1][2]] if currencies else None
+        # Only whitespace between the amount and the token just before it, which is a currency
+        prefixed = gap_blank and in_reach[-1][2] is not None
+        return PriceCandidate(value, position, rank, currency, prefixed)
+
+    def best(self) -> Optional[PriceCandidate]:
+        """
+        The most likely product price: the first amount labelled by the strongest
+        keyword within CONTEXT_WINDOW characters. Amounts with no label are ignored.
+        """
+        # Nothing later can beat an amount labelled by the strongest keyword, unless
+        # it ends the text so far and its currency is written in the next window
+        while ((self._strongest is None or (self._last_amount and self._last_amount[0] is self._strongest))
+               and self._advance()):
+            pass
+        labelled = [c for c in self.candidates if c.rank is not None]
+        if not labelled:
+            return None
+        strongest = min(c.rank for c in labelled)
+        return next(c for c in labelled if c.rank == strongest)
+
+    def first_currency_price(self, minimum: float) -> Optional[PriceCandidate]:
+        """First amount written right after a currency that is at least `minimum`."""
+        checked = 0
+        while True:
+            for candidate in self.candidates[checked:]:
+                if candidate.prefixed and candidate.value >= minimum:
+                    return candidate
+            checked = len(self.candidates)
+            if not self._advance():
+                return None
+
+    def page_currency(self) -> Optional[str]:
+        """Currency to assume when the price has none next to it."""
+        while CURRENCY_PRIORITY[0] not in self.currencies_seen and self._advance():
+            pass
+        for key in CURRENCY_PRIORITY:
+            if key in self.currencies_seen:
+                return CURRENCY_CODES[key]
+        return None
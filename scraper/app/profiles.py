@@ -0,0 +1,90 @@
+"""Per-domain extraction profiles: learn which extraction stages pay off on each site."""
+from collections import Counter, OrderedDict
+from typing import Dict, Any, Optional
+
+from app.config import PROFILE_MIN_PAGES, PROFILE_RECHECK_EVERY, PROFILE_MAX_DOMAINS
+from app.extraction import GALLERY_SELECTORS
+from app.ratelimit import host_of
+
+
+class DomainProfile:
+    """What the extraction chain did on the pages seen so far from one domain."""
+
+    def __init__(self):
+        self.pages = 0
+        self.runs: Counter = Counter()
+        self.wins: Counter = Counter()
+        self.image_selectors: Counter = Counter()
+        self.fast_paths = 0
+        self.fallbacks = 0
+
+    def record(self, trace: dict) -> None:
+        self.pages += 1
+        self.runs.update(trace.get("ran", ()))
+        self.wins.update(trace.get("won", ()))
+        if trace.get("image_selector") in GALLERY_SELECTORS:
+            self.image_selectors[trace["image_selector"]] += 1
+        if trace.get("fallback"):
+            self.fallbacks += 1
+
+    def hints(self, min_pages: int) -> Optional[dict]:
+        """Stages that ran on min_pages pages without ever supplying a field, and the usual gallery selector."""
+        skip = [stage for stage, runs in self.runs.items() if runs >= min_pages and not self.wins[stage]]
+        selector = self.image_selectors.most_common(1)[0][0] if self.image_selectors else None
+        if not skip and not selector:
+            return None
+        return {"skip": skip, "image_selector": selector}
+
+
+class ProfileStore:
+    """
+    LRU of domain profiles. Hints only kick in after min_pages pages from a domain,
+    and every recheck_every-th page runs the full chain so a site that changes its
+    markup is noticed.
+    """
+
+    def __init__(self, min_pages: int = PROFILE_MIN_PAGES, recheck_every: int = PROFILE_RECHECK_EVERY,
+                 max_domains: int = PROFILE_MAX_DOMAINS):
+        self.min_pages = min_pages
+        self.recheck_every = recheck_every
+        self.max_domains = max_domains
+        self._profiles: "OrderedDict[str, DomainProfile]" = OrderedDict()
+
+    def hints(self, url: str) -> Optional[dict]:
+        profile = self._profiles.get(host_of(url))
+        if profile is None or profile.pages < self.min_pages:
+            return None
+        if self.recheck_every and profile.pages % self.recheck_every == 0:
+            return None
+        return profile.hints(self.min_pages)
+
+    def record(self, url: str, trace: dict, hinted: bool = False) -> None:
+        domain = host_of(url)
+        profile = self._profiles.get(domain)
+        if profile is None:
+            profile = self._profiles[domain] = DomainProfile()
+        self._profiles.move_to_end(domain)
+        profile.record(trace)
+        if hinted and not trace.get("fallback"):
+            profile.fast_paths += 1
+        while len(self._profiles) > self.max_domains:
+            self._profiles.popitem(last=False)
+
+    def clear(self) -> None:
+        self._profiles.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "domains": len(self._profiles),
+            "pages": sum(p.pages for p in self._profiles.values()),
+            "fast_paths": sum(p.fast_paths for p in self._profiles.values()),
+            "fallbacks": sum(p.fallbacks for p in self._profiles.values()),
+            "skipping": {
+                domain: hints["skip"]
+                for domain, hints in ((d, p.hints(self.min_pages)) for d, p in self._profiles.items())
+                if hints and hints["skip"]
+            },
+        }
+
+
+extraction_profiles = ProfileStore()
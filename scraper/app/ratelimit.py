@@ -0,0 +1,225 @@
+"""Per-host fetch scheduling: concurrency limits, token-bucket rates and adaptive backoff."""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+from urllib.parse import urlsplit
+
+from app.config import (
+    FETCH_MAX_CONCURRENCY,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HOST_RATE,
+    HOST_BURST,
+    HOST_SLOW_LATENCY,
+)
+
+# Statuses that mean "slow down" rather than "this page is broken"
+THROTTLE_STATUSES = {429, 503}
+
+# Lowest fraction of HOST_RATE a throttled host is slowed down to
+MIN_RATE_FACTOR = 0.1
+
+# Hosts idle for this long are forgotten
+HOST_IDLE_TTL = 600
+
+
+def host_of(url: str) -> str:
+    try:
+        return (urlsplit(url).hostname or "").lower()
+    except ValueError:
+        # Malformed URL (e.g. "http://[::1"); the fetch itself reports the error
+        return ""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Turn a Retry-After header (seconds or an HTTP date) into a delay in seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class HostState:
+    """Limits and counters for one host."""
+
+    def __init__(self, concurrency: int, rate: float, burst: int):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.base_rate = rate
+        self.rate_factor = 1.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.slowed_at = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.requests = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_used = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.base_rate * self.rate_factor
+
+    def slow_down(self, started: float) -> None:
+        """
+        Halve the rate, once per round of requests: responses to requests sent before
+        the last slow-down describe the old rate and must not cut it again.
+        """
+        if started < self.slowed_at:
+            return
+        self.rate_factor = max(self.rate_factor / 2, MIN_RATE_FACTOR)
+        self.slowed_at = time.monotonic()
+
+    def take_token(self, now: float) -> float:
+        """Take a token if one is available; otherwise return how long to wait for one."""
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class HostScheduler:
+    """
+    Gate every page fetch behind a global semaphore, a per-host semaphore and a
+    per-host token bucket. Each host's rate adapts: halved on 429/503 or slow
+    responses (and paused for any Retry-After), then recovered step by step
+    while responses are healthy.
+    """
+
+    def __init__(self, max_concurrency: int = FETCH_MAX_CONCURRENCY,
+                 host_concurrency: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+                 rate: float = HOST_RATE, burst: int = HOST_BURST,
+                 slow_latency: float = HOST_SLOW_LATENCY):
+        self.max_concurrency = max_concurrency
+        self.host_concurrency = host_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.slow_latency = slow_latency
+        self._global: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, HostState] = {}
+        self._calls = 0
+
+    def _state(self, host: str) -> HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.host_concurrency, self.rate, self.burst)
+        return state
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """Wait for this URL's turn; the body of the with-block is the fetch itself."""
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        self._calls += 1
+        if self._calls % 1000 == 0:
+            self._prune()
+
+        state = self._state(host_of(url))
+        state.waiting += 1
+        queued_at = time.monotonic()
+        try:
+            # Per-host first, so one busy retailer can't hold every global slot while it waits
+            await state.slots.acquire()
+            try:
+                while True:
+                    delay = state.take_token(time.monotonic())
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                await self._global.acquire()
+            except BaseException:
+                state.slots.release()
+                raise
+        finally:
+            state.waiting -= 1
+
+        waited = time.monotonic() - queued_at
+        state.total_wait += waited
+        state.max_wait = max(state.max_wait, waited)
+        state.requests += 1
+        state.in_flight += 1
+        try:
+            yield state
+        finally:
+            state.in_flight -= 1
+            state.last_used = time.monotonic()
+            self._global.release()
+            state.slots.release()
+
+    def feedback(self, url: str, status: int, started: float, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Adapt the host's rate to a response whose request was sent at `started` (time.monotonic()).
+        Returns the Retry-After delay in seconds when the host asked us to back off.
+        """
+        state = self._state(host_of(url))
+        latency = time.monotonic() - started
+        state.latency_ewma = latency if state.latency_ewma is None else 0.8 * state.latency_ewma + 0.2 * latency
+
+        if status in THROTTLE_STATUSES:
+            state.throttled += 1
+            state.slow_down(started)
+            delay = parse_retry_after(retry_after)
+            pause = delay if delay is not None else 1 / state.rate
+            state.blocked_until = max(state.blocked_until, time.monotonic() + pause)
+            state.tokens = 0.0
+            return delay
+
+        if latency > self.slow_latency:
+            state.slow_down(started)
+        elif state.rate_factor < 1.0:
+            state.rate_factor = min(state.rate_factor * 1.25, 1.0)
+        return None
+
+    def _prune(self) -> None:
+        """Forget hosts that have been idle for a while so the table stays small."""
+        cutoff = time.monotonic() - HOST_IDLE_TTL
+        for host, state in list(self._hosts.items()):
+            if state.last_used < cutoff and not state.in_flight and not state.waiting:
+                del self._hosts[host]
+
+    def stats(self, limit: int = 50) -> Dict[str, Any]:
+        """Queue depth and wait time overall and for the busiest hosts."""
+        now = time.monotonic()
+        hosts = sorted(self._hosts.items(), key=lambda item: item[1].requests, reverse=True)[:limit]
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": sum(s.in_flight for s in self._hosts.values()),
+            "queue_depth": sum(s.waiting for s in self._hosts.values()),
+            "hosts": {
+                host: {
+                    "in_flight": s.in_flight,
+                    "queue_depth": s.waiting,
+                    "requests": s.requests,
+                    "throttled": s.throttled,
+                    "avg_wait": round(s.total_wait / s.requests, 4) if s.requests else 0.0,
+                    "max_wait": round(s.max_wait, 4),
+                    "rate": round(s.rate, 4),
+                    "latency_ewma": round(s.latency_ewma, 4) if s.latency_ewma is not None else None,
+                    "blocked_for": round(max(s.blocked_until - now, 0.0), 2),
+                }
+                for host, s in hosts
+            },
+        }
+
+    def reset(self) -> None:
+        """Drop all per-host state (the app lifespan calls this on shutdown)."""
+        self._hosts.clear()
+        self._global = None
+
+
+# Process-wide scheduler used for every page fetch
+host_scheduler = HostScheduler()
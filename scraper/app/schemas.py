@@ -1,8 +1,10 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Literal, Optional
 
 class ScrapeRequest(BaseModel):
     url: str
+    # Ignore a fresh cached result and revalidate the page (used by price refreshes)
+    refresh: bool = False
 
 class ScrapeResponse(BaseModel):
     title: Optional[str]
@@ -12,7 +14,37 @@ class ScrapeResponse(BaseModel):
     description: Optional[str]
     url: str
 
+class BatchScrapeRequest(BaseModel):
+    urls: List[str]
+    refresh: bool = False
+
+class BatchScrapeItem(ScrapeResponse):
+    # Position of the URL in the request
+    index: int
+    # Every position in the request this result answers, duplicates included
+    indices: List[int]
+    success: bool
+    error: Optional[str] = None
+
+class BatchScrapeResponse(BaseModel):
+    results: List[BatchScrapeItem]
+    submitted: int
+    # Blank URLs and URLs that canonicalize to one earlier in the batch
+    # (the latter are listed in the earlier entry's `indices`)
+    skipped: int
+    succeeded: int
+
+class MonitorTrackRequest(BaseModel):
+    urls: List[str]
+    # Base refresh interval in seconds; the server default when omitted
+    interval: Optional[float] = None
+
+class MonitorUntrackRequest(BaseModel):
+    urls: List[str]
+
 class GoogleSearchScrapeRequest(BaseModel):
     query: str
     num_results: int = 5
     country_code: str = "com"
+    # "auto": local product index first, live search for the rest; "index": index only; "live": live only
+    mode: Literal["auto", "index", "live"] = "auto"
@@ -1,450 +1,276 @@
-import random, re
-import httpx
-import extruct
-from w3lib.html import get_base_url
-from bs4 import BeautifulSoup
-from app.config import USER_AGENTS, HEADERS
-from googlesearch import search
-import asyncio
-from typing import Dict, List, Any, Optional
-import json
-
-# Enhanced list of currency symbols and currency codes that can appear in prices
-CURRENCY_SYMBOLS = ["$", "₹", "£", "€", "Rs.", "Rs", "PKR", "USD", "₨"]
-
-# More comprehensive regex that captures various price formats
-PRICE_REGEX = re.compile(
-    r'(?:[$€£₹₨]|Rs\.?|PKR|USD)\s*[,\d]+(?:\.\d{1,2})?|\d{1,3}(?:,\d{3})*(?:\.\d{1,2})?\s*(?:[$€£₹₨]|Rs\.?|PKR|USD)',
-    re.IGNORECASE
+from app.http_client import browser_headers, get_client
+from app.ratelimit import host_scheduler, THROTTLE_STATUSES
+from app.extraction import MINIMUM_PRICE_THRESHOLD, MAX_PRODUCT_IMAGES
+from app.executor import run_extraction
+from app.cache import scrape_cache, canonicalize_url
+from app.config import (
+    CACHE_ENABLED, HOST_MAX_RETRIES, HOST_MAX_RETRY_AFTER, PROFILES_ENABLED, INDEX_ENABLED, IMAGE_PROBE_ENABLED,
 )
-
-# Specific regex for price extraction and cleaning
-PRICE_EXTRACT_REGEX = re.compile(r'([0-9,]+(?:\.\d{1,2})?)')
-
-# Price context keywords to improve extraction
-PRICE_CONTEXT_KEYWORDS = [
-    "price", "cost", "total", "pay", "buy", "rs", "$", "₹", "£", "€", "₨", "pkr", "usd"
-]
-
-# Minimum price threshold for laptops (to avoid false positives)
-MINIMUM_PRICE_THRESHOLD = 50
+from app.streaming import read_body
+from app.singleflight import SingleFlight
+from app.search import search_urls, search_variants, prefetch_search
+from app.profiles import extraction_profiles
+from app.index import product_index
+from app.images import image_prober
+from app.dedupe import ResultDeduper
+from app.metrics import ConnectionTracer, timed, record_extraction, record_error, scrapes, download_bytes
+import asyncio
+import hashlib
+import time
+from typing import Dict, Any, Optional, Tuple
 
 async def fetch_page(url: str) -> str:
     """Fetch a web page with a random user agent to avoid being blocked."""
-    headers = {
-        'User-Agent': random.choice(USER_AGENTS),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Referer': 'https://www.google.com/',
-        'DNT': '1',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
-    async with httpx.AsyncClient(follow_redirects=True, timeout=30, headers=headers) as client:
-        response = await client.get(url)
-        return response.text
+    async with host_scheduler.slot(url):
+        response = await get_client().get(url, headers=browser_headers())
+    return response.text
 
-def extract_structured_data(html: str, url: str) -> dict:
-    """Extract product information from structured data (JSON-LD or Microdata)."""
-    data = extruct.extract(html, base_url=get_base_url(html, url), syntaxes=["json-ld", "microdata"])
-    for entry in data.get("json-ld", []) + [i.get("properties") for i in data.get("microdata", []) if i.get("properties")]:
-        if not entry:
-            continue
-            
-        # Check if it's a product or has product info
-        if entry.get("@type", "").lower() == "product" or "price" in entry or "offers" in entry:
-            # Extract image from various possible locations
-            image = None
-            if "image" in entry:
-                image = entry["image"]
-                # Handle if image is a list or dict
-                if isinstance(image, list) and image:
-                    image = image[0]
-                if isinstance(image, dict) and "url" in image:
-                    image = image["url"]
-            
-            # Extract price information
-            price = None
-            currency = None
-            if "offers" in entry:
-                offers = entry["offers"]
-                if isinstance(offers, dict):
-                    price = safe_float(offers.get("price"))
-                    currency = offers.get("priceCurrency")
-                elif isinstance(offers, list) and offers:
-                    price = safe_float(offers[0].get("price"))
-                    currency = offers[0].get("priceCurrency")
-            elif "price" in entry:
-                price = safe_float(entry.get("price"))
-                
-            return {
-                "title": entry.get("name"),
-                "price": price,
-                "currency": currency,
-                "image": image,
-                "description": entry.get("description"),
-            }
-    return {}
+# Concurrent scrapes of the same page and identical searches share one execution
+scrape_flights = SingleFlight()
+search_flights = SingleFlight()
 
-def extract_meta_tags(html: str) -> dict:
-    """Extract product information from meta tags."""
-    soup = BeautifulSoup(html, "lxml")
-    out = {}
-    mappings = {
-        "og:title": "title",
-        "og:description": "description",
-        "og:image": "image",
-        "og:price:amount": "price",
-        "product:price:amount": "price",
-        "og:price:currency": "currency",
-        "product:price:currency": "currency",
-        "twitter:image": "image"
-    }
-    for prop, key in mappings.items():
-        tag = soup.find("meta", property=prop) or soup.find("meta", attrs={"name": prop})
-        if tag and tag.get("content"):
-            out[key] = tag["content"]
-    if "price" in out:
-        out["price"] = safe_float(out["price"])
-    return out
+async def scrape_product(url: str, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Scrape product information from a given URL.
+    Enhanced to extract product images and improve price detection.
+    Results are cached per canonical URL, so a hit skips both the download and the parse,
+    and concurrent scrapes of the same canonical URL share a single fetch.
+    refresh=True skips the fresh-cache lookup (for price refreshes) but still revalidates
+    against the previous result, so an unchanged page is neither downloaded in full nor reparsed.
+    """
+    key = canonicalize_url(url)
+    if CACHE_ENABLED and not refresh:
+        cached = await scrape_cache.get(key)
+        if cached is not None:
+            cached["url"] = url
+            return cached
 
-def extract_price_from_dom(html: str) -> dict:
-    """Extract price from the DOM using regex."""
-    soup = BeautifulSoup(html, "lxml")
-    text = soup.get_text(separator=" ")
-    
-    # Look for prices near price indicators first
-    for keyword in PRICE_CONTEXT_KEYWORDS:
-        pattern = re.compile(rf'{keyword}[^\d]{{0,15}}([0-9,]+(?:\.\d{{1,2}})?)', re.IGNORECASE)
-        matches = pattern.findall(text)
-        if matches:
-            return {
-                "price": safe_float(matches[0]),
-                "currency": detect_currency(text, matches[0]) or "USD",
-            }
-    
-    # Fall back to general price pattern
-    match = PRICE_REGEX.search(text)
-    if match:
-        price_text = match.group(0)
-        currency = detect_currency(price_text)
-        price = extract_number_from_price(price_text)
-        return {
-            "price": price,
-            "currency": currency or "USD",
-        }
-    return {}
+    result = await scrape_flights.do(key, lambda: fetch_and_cache(key, url))
+    # Every caller gets its own copy, labelled with the URL it asked for
+    return {**result, "url": url}
 
-def detect_currency(text: str, price_str: str = None) -> Optional[str]:
-    """Detect currency symbol or code in text."""
-    currency_mapping = {
-        "$": "USD", "USD": "USD", "usd": "USD",
-        "₹": "INR", "Rs": "PKR", "Rs.": "PKR", "PKR": "PKR", "pkr": "PKR",
-        "₨": "PKR",
-        "£": "GBP", 
-        "€": "EUR"
-    }
-    
-    # Look for currency symbols in the text
-    for symbol, code in currency_mapping.items():
-        if symbol in text:
-            return code
-    
-    # Default to USD if no currency found
-    return "USD"
+async def fetch_and_cache(key: str, url: str) -> Dict[str, Any]:
+    """
+    Fetch a page (revalidating any previous result) and store the outcome in the cache.
+    Successful results also go into the local product index for later searches.
+    """
+    if not CACHE_ENABLED:
+        with timed("scrape"):
+            result, _ = await fetch_product(url)
+    else:
+        with timed("scrape"):
+            result, validators = await fetch_product(url, await scrape_cache.get_stale(key))
+        await scrape_cache.set(key, result, validators)
 
-def extract_number_from_price(price_str: str) -> float:
-    """Extract the numeric part from a price string."""
-    match = PRICE_EXTRACT_REGEX.search(price_str)
-    if match:
-        return safe_float(match.group(1))
-    return None
+    if INDEX_ENABLED and result.get("success"):
+        # SQLite can wait on other workers' writes; keep that off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, product_index.add, key, result)
+    return result
 
-def safe_float(val):
-    """Convert value to float, handling exceptions and formatting issues."""
-    if val is None:
-        return None
+async def fetch_product(url: str, previous: Optional[Tuple[Dict[str, Any], Dict[str, str]]] = None
+                        ) -> Tuple[Dict[str, Any], Optional[Dict[str, str]]]:
+    """
+    Download a product page and extract its details, bypassing the cache.
+    The body is streamed and reading stops early once title, price and image are known.
+    Fetches are paced per host, and a 429/503 is retried after the host's Retry-After.
+    When a previous (result, validators) pair is given the request is conditional:
+    a 304 or an identical body returns the previous result without parsing.
+    Returns the result and the validators to store with it.
+    """
     try:
-        if isinstance(val, str):
-            # Remove currency symbols and commas
-            for symbol in CURRENCY_SYMBOLS:
-                val = val.replace(symbol, "")
-            # Handle unicode decimal points or other separators
-            val = val.replace(",", "").strip()
-        return float(val)
-    except (ValueError, TypeError):
-        return None
+        headers = browser_headers()
+        if previous:
+            validators = previous[1]
+            if validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
 
-def extract_images(soup: BeautifulSoup, url: str) -> List[str]:
-    """Extract product images from the page."""
-    images = []
-    base_url = get_base_url(str(soup), url)
-    
-    # 1. Look for product image galleries
-    gallery_selectors = [
-        '.product-gallery img', '.product-image img', '.product img', 
-        '[id*="product"] img', '[class*="product"] img',
-        '[id*="gallery"] img', '[class*="gallery"] img',
-        '[id*="slider"] img', '[class*="slider"] img',
-        'figure img', '.item-image img'
-    ]
-    
-    for selector in gallery_selectors:
-        img_elements = soup.select(selector)
-        if img_elements:
-            for img in img_elements:
-                src = img.get('src') or img.get('data-src')
-                if src:
-                    # Convert relative URLs to absolute
-                    abs_url = urljoin_safe(base_url, src)
-                    if abs_url and is_likely_product_image(abs_url, img):
-                        images.append(abs_url)
-    
-    # 2. If no gallery found, check for main product image
-    if not images:
-        main_img_selectors = [
-            'meta[property="og:image"]', 'meta[name="twitter:image"]',
-            '[id*="main-image"]', '[class*="main-image"]',
-            '[id*="featured-image"]', '[class*="featured-image"]',
-            '.product-image-main img', '.main-product-image'
-        ]
-        
-        for selector in main_img_selectors:
-            elements = soup.select(selector)
-            if elements:
-                for el in elements:
-                    src = el.get('content') or el.get('src') or el.get('data-src')
-                    if src:
-                        abs_url = urljoin_safe(base_url, src)
-                        if abs_url:
-                            images.append(abs_url)
-                            break
-    
-    # 3. Last resort: get any reasonably sized image
-    if not images:
-        for img in soup.find_all('img'):
-            src = img.get('src') or img.get('data-src')
-            if src and is_likely_product_image(src, img):
-                abs_url = urljoin_safe(base_url, src)
-                if abs_url:
-                    images.append(abs_url)
-    
-    # Remove duplicates while preserving order
-    return list(dict.fromkeys(images))
+        for attempt in range(HOST_MAX_RETRIES + 1):
+            async with host_scheduler.slot(url):
+                started = time.monotonic()
+                # The tracer times connection setup and the wait for the first byte
+                async with get_client().stream("GET", url, headers=headers,
+                                               extensions={"trace": ConnectionTracer()}) as response:
+                    retry_after = host_scheduler.feedback(
+                        url, response.status_code, started, response.headers.get("retry-after"))
+                    if response.status_code in THROTTLE_STATUSES and attempt < HOST_MAX_RETRIES and (
+                            retry_after is None or retry_after <= HOST_MAX_RETRY_AFTER):
+                        # Throttled: the scheduler now holds this host back, so just queue up again
+                        continue
+                    if response.status_code == 304 and previous:
+                        scrape_cache.record_revalidation("not_modified")
+                        scrapes.inc(outcome="not_modified")
+                        return {**previous[0], "url": url}, previous[1]
+                    if response.status_code != 200:
+                        record_error(url, f"http_{response.status_code}")
+                        return {"url": url, "error": f"Failed to fetch page: {response.status_code}", "success": False}, None
 
-def urljoin_safe(base: str, url: str) -> Optional[str]:
-    """Safely join base URL and relative URL."""
-    try:
-        from urllib.parse import urljoin
-        return urljoin(base, url)
-    except:
-        return url
+                    # Stream the body so big pages stop downloading once the product data is in
+                    with timed("download"):
+                        content, complete = await read_body(response)
+                    download_bytes.inc(len(content))
+                    break
 
-def is_likely_product_image(url: str, img_tag) -> bool:
-    """Check if an image is likely to be a product image."""
-    # Skip very small images, icons, or typical non-product images
-    skip_patterns = ['icon', 'logo', 'banner', 'sprite', 'tracking', 'pixel', 'button', 'transparent']
-    
-    if any(pattern in url.lower() for pattern in skip_patterns):
-        return False
-        
-    # Check image dimensions if available
-    width = img_tag.get('width')
-    height = img_tag.get('height')
-    
-    if width and height:
-        try:
-            w, h = int(width), int(height)
-            # Skip very small images
-            if w < 100 or h < 100:
-                return False
-        except (ValueError, TypeError):
-            pass
-    
-    return True
+        validators = {
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            # Only a full body can be compared; where an early stop cuts the page depends on chunking
+            "content_hash": hashlib.sha256(content).hexdigest() if complete else None,
+        }
+        if previous:
+            if not validators["content_hash"] or not previous[1].get("content_hash"):
+                scrape_cache.record_revalidation("unknown")
+            elif previous[1]["content_hash"] == validators["content_hash"]:
+                scrape_cache.record_revalidation("unchanged")
+                scrapes.inc(outcome="unchanged")
+                return {**previous[0], "url": url}, validators
+            else:
+                scrape_cache.record_revalidation("changed")
 
-async def scrape_product(url: str) -> Dict[str, Any]:
-    """
-    Scrape product information from a given URL.
-    Enhanced to extract product images and improve price detection.
-    """
-    try:
-        async with httpx.AsyncClient(follow_redirects=True, timeout=30, headers={
-            'User-Agent': random.choice(USER_AGENTS),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Referer': 'https://www.google.com/',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }) as client:
-            response = await client.get(url)
-            if response.status_code != 200:
-                return {"url": url, "error": f"Failed to fetch page: {response.status_code}", "success": False}
-            
-            html_content = response.text
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Extract basic product information
-            title = soup.title.string if soup.title else "Unknown Title"
-            
-            # ---- PRODUCT EXTRACTION METHODS (Multiple sources) ----
-            
-            price = None
-            images = []
-            description = None
-            
-            # METHOD 1: Extract from JSON-LD structured data
-            structured_data = extract_structured_data(html_content, url)
-            if structured_data:
-                if structured_data.get("price"):
-                    price = structured_data.get("price")
-                if structured_data.get("image"):
-                    image_url = structured_data.get("image")
-                    if isinstance(image_url, list):
-                        images.extend(image_url)
-                    else:
-                        images.append(image_url)
-                if structured_data.get("description"):
-                    description = structured_data.get("description")
-                if structured_data.get("title"):
-                    title = structured_data.get("title")
-            
-            # METHOD 2: Extract from meta tags
-            if not price or not images or not description:
-                meta_data = extract_meta_tags(html_content)
-                if not price and meta_data.get("price"):
-                    price = meta_data.get("price")
-                if not images and meta_data.get("image"):
-                    images.append(meta_data.get("image"))
-                if not description and meta_data.get("description"):
-                    description = meta_data.get("description")
-                if not title and meta_data.get("title"):
-                    title = meta_data.get("title")
-            
-            # METHOD 3: Extract price from DOM
-            if not price:
-                dom_price_data = extract_price_from_dom(html_content)
-                if dom_price_data.get("price"):
-                    price = dom_price_data.get("price")
-            
-            # METHOD 4: Extract images from DOM
-            if not images:
-                images = extract_images(soup, url)
-            
-            # METHOD 5: Find description if not found earlier
-            if not description:
-                desc_elements = soup.select('[class*="description"], [id*="description"], meta[name="description"], [itemprop="description"]')
-                if desc_elements:
-                    if desc_elements[0].name == "meta":
-                        description = desc_elements[0].get('content', '')
-                    else:
-                        description = desc_elements[0].get_text().strip()
-            
-            # Apply price validation (skip spuriously low prices)
-            if price is not None and isinstance(price, (int, float)) and price < MINIMUM_PRICE_THRESHOLD:
-                # Look for another price in the page that's more reasonable
-                dom_text = soup.get_text()
-                price_matches = re.findall(r'(?:[$€£₹₨]|Rs\.?|PKR|USD)\s*([,\d]+(?:\.\d{1,2})?)', dom_text)
-                valid_prices = [safe_float(p.replace(',', '')) for p in price_matches if safe_float(p.replace(',', '')) >= MINIMUM_PRICE_THRESHOLD]
-                if valid_prices:
-                    price = valid_prices[0]
-            
-            # Return structured data with images
-            return {
-                "url": url,
-                "title": title,
-                "price": price,
-                "description": description,
-                "images": images[:5] if images else [],  # Limit to first 5 images
-                "success": True
-            }
+        # Parse once and run every extraction step over the same tree, off the event loop
+        # when a thread/process executor is configured; the domain profile says which steps to skip
+        hints = extraction_profiles.hints(url) if PROFILES_ENABLED else None
+        product = await run_extraction(content, url, response.charset_encoding, hints)
+        trace = product.pop("trace", None)
+        if PROFILES_ENABLED and trace:
+            extraction_profiles.record(url, trace, hinted=hints is not None)
+        record_extraction(trace)
+        # Drop tracking pixels, thumbnails and dead links, largest image first
+        if IMAGE_PROBE_ENABLED and product.get("images"):
+            product["images"] = await image_prober.rank(product["images"])
+        product["images"] = product["images"][:MAX_PRODUCT_IMAGES]
+        scrapes.inc(outcome="ok")
+        return {"url": url, **product, "success": True}, validators
     except Exception as e:
-        return {"url": url, "error": str(e), "success": False}
+        record_error(url, type(e).__name__)
+        return {"url": url, "error": str(e), "success": False}, None
+
+def is_complete_product(result: Dict[str, Any]) -> bool:
+    """Only results with a valid price, title, URL and at least one image count towards a search."""
+    return bool(
+        result.get("success") and
+        result.get("price") is not None and
+        result.get("price") != "" and
+        result.get("title") and
+        result.get("url") and
+        result.get("images") and  # Require images
+        # Make sure price is a reasonable value for a laptop
+        isinstance(result["price"], (int, float)) and result["price"] >= MINIMUM_PRICE_THRESHOLD
+    )
 
-async def search_google_and_scrape(query: str, num_results: int = 10, country_code: str = "com"):
+async def search_google_and_scrape(query: str, num_results: int = 10, country_code: str = "com",
+                                   mode: str = "auto"):
     """
     Search Google for the given query, restricted to the given country_code (TLD),
     and scrape product info from the top num_results links.
     Will continue searching until we have num_results complete products with prices and images.
+    Identical searches running at the same time share one search.
     
     country_code: e.g. 'com', 'co.uk', 'com.pk', etc.
+    mode: "auto" answers from the local product index first and only searches live
+    for the rest, "index" only uses the index, "live" always searches.
+    """
+    key = (" ".join(query.lower().split()), country_code.lower(), num_results, mode)
+    results = await search_flights.do(key, lambda: collect_search_results(query, num_results, country_code, mode))
+    return {"results": list(results["results"])}
+
+async def collect_search_results(query: str, num_results: int, country_code: str, mode: str = "auto"):
+    """Run the search to completion and gather its complete products."""
+    complete_results = [result async for result in iter_search_results(query, num_results, country_code, mode)]
+
+    # If we couldn't find enough results with all the specified criteria,
+    # return what we have
+    if len(complete_results) < num_results:
+        print(f"Could only find {len(complete_results)} complete results after exhaustive search.")
+    
+    return {"results": complete_results[:num_results]}
+
+async def iter_search_results(query: str, num_results: int = 10, country_code: str = "com",
+                              mode: str = "auto"):
+    """
+    Yield complete products for a Google search as soon as each one is scraped and validated.
+    Pages are consumed in completion order, and the scrapes still running are cancelled
+    once num_results products have been yielded (or the consumer stops iterating).
+    Unless mode is "live", fresh matches from the local product index come first and
+    the live search only tops them up.
+    Tracking-parameter, mobile and AMP variants of a page already scheduled are not
+    scraped again, and a product that duplicates one already yielded (same canonical
+    page, or near-identical title at the same price) does not count towards num_results.
     """
     # Initial variables
-    complete_results = []
-    searched_urls = set()
+    found = 0
+    deduper = ResultDeduper()
+
+    if mode != "live" and INDEX_ENABLED:
+        indexed = await asyncio.get_running_loop().run_in_executor(
+            None, product_index.search, query, num_results)
+        for result in indexed:
+            deduper.claim_url(result["url"])
+            if not deduper.accept(result):
+                continue
+            found += 1
+            yield result
+        print(f"Served {found}/{num_results} results from the product index")
+    if mode == "index":
+        return
+
     batch_size = min(num_results * 4, 40)  # Search for more results initially
     start_index = 0
     max_attempts = 15  # Increased for more persistence
     attempts = 0
     
+    # Add price-related keywords to improve results with pricing
+    search_queries = search_variants(query)
+    
     # Continue until we have enough results or run out of attempts
-    while len(complete_results) < num_results and attempts < max_attempts:
+    while found < num_results and attempts < max_attempts:
         # Get more search results
-        loop = asyncio.get_event_loop()
         try:
-            print(f"Search attempt {attempts+1}/{max_attempts} - Found {len(complete_results)}/{num_results} complete results")
-            
-            # Add price-related keywords to improve results with pricing
-            search_queries = [
-                f"{query} price",
-                f"{query} buy online",
-                f"{query} shop price",
-                f"{query} specifications price"
-            ]
+            print(f"Search attempt {attempts+1}/{max_attempts} - Found {found}/{num_results} complete results")
             
             search_query = search_queries[attempts % len(search_queries)]
             
-            # Get a batch of URLs we haven't seen before
-            raw_urls = await loop.run_in_executor(
-                None, 
-                lambda: list(search(
-                    search_query,
-                    num_results=batch_size,
-                    lang="en", 
-                    region=country_code, 
-                    start_num=start_index,
-                    sleep_interval=1  # Add a small delay between requests
-                ))
-            )
+            # Get a batch of URLs we haven't seen before (cached per variant/region/offset)
+            raw_urls = await search_urls(search_query, country_code, start_index, batch_size)
+            
+            # Speculatively fetch the next page while this batch is being scraped
+            if attempts + 1 < max_attempts:
+                prefetch_search(search_queries[(attempts + 1) % len(search_queries)],
+                                country_code, start_index + batch_size, batch_size)
             
-            # Filter out URLs we've already seen
-            new_urls = []
-            for url in raw_urls:
-                if url not in searched_urls:
-                    new_urls.append(url)
-                    searched_urls.add(url)
+            # Filter out URLs we've already seen (including variants of the same page)
+            new_urls = [url for url in raw_urls if deduper.claim_url(url)]
             
             # If still no new URLs, we've exhausted the search
             if not new_urls:
-                print(f"No more new URLs found. Stopping after {len(complete_results)} complete results.")
+                print(f"No more new URLs found. Stopping after {found} complete results.")
                 break
                 
             print(f"Found {len(new_urls)} new URLs to scrape")
             
-            # Scrape each result concurrently
-            tasks = [scrape_product(url) for url in new_urls]
-            results = await asyncio.gather(*tasks)
-            
-            # Filter for complete results with prices and images
+            # Scrape each result concurrently and take them as they finish
+            tasks = [asyncio.ensure_future(scrape_product(url)) for url in new_urls]
             new_complete_count = 0
-            for result in results:
-                # Only add results that have a valid price, title, URL and at least one image
-                if (result.get("success") and 
-                    result.get("price") is not None and 
-                    result.get("price") != "" and 
-                    result.get("title") and 
-                    result.get("url") and
-                    result.get("images")):  # Require images
-                    
-                    # Make sure price is a reasonable value for a laptop
-                    if isinstance(result["price"], (int, float)) and result["price"] >= MINIMUM_PRICE_THRESHOLD:
-                        complete_results.append(result)
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    if is_complete_product(result) and deduper.accept(result):
+                        found += 1
                         new_complete_count += 1
+                        yield result
                         
                         # Stop once we have enough complete results
-                        if len(complete_results) >= num_results:
+                        if found >= num_results:
                             break
+            finally:
+                # Don't keep downloading pages nobody is waiting for
+                pending = [task for task in tasks if not task.done()]
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    print(f"Cancelled {len(pending)} outstanding scrapes")
+                    await asyncio.gather(*pending, return_exceptions=True)
             
             print(f"Found {new_complete_count} new complete results with prices and images in this batch")
             
@@ -460,10 +286,3 @@ async def search_google_and_scrape(query: str, num_results: int = 10, country_co
         except Exception as e:
             print(f"Error in search batch: {e}")
             attempts += 1
-    
-    # If we couldn't find enough results with all the specified criteria,
-    # return what we have
-    if len(complete_results) < num_results:
-        print(f"Could only find {len(complete_results)} complete results after exhaustive search.")
-    
-    return {"results": complete_results[:num_results]}
\ No newline at end of file
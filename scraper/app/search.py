@@ -0,0 +1,152 @@
+"""Search result URL lists: a TTL cache in front of googlesearch, plus speculative prefetch."""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+
+from app.config import SEARCH_CACHE_TTL, SEARCH_CACHE_MAX_ENTRIES, SEARCH_PREFETCH
+from app.singleflight import SingleFlight
+from app.metrics import timed
+
+SearchKey = Tuple[str, str, int, int]
+
+
+class SearchResultCache:
+    """LRU of search result URL lists that expire after ttl seconds."""
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_MAX_ENTRIES, ttl: float = SEARCH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[SearchKey, Tuple[float, List[str]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def get(self, key: SearchKey) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def has_fresh(self, key: SearchKey) -> bool:
+        """Check for an unexpired entry without counting a hit or miss."""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def set(self, key: SearchKey, urls: List[str]) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.time() + self.ttl, list(urls))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "prefetched": self.prefetched,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+search_cache = SearchResultCache()
+# A prefetch still running when the same page is asked for is joined, not repeated
+_search_flights = SingleFlight()
+# Keep references so running prefetches aren't garbage collected
+_prefetches: Set[asyncio.Future] = set()
+
+
+def google_search(*args, **kwargs):
+    """googlesearch.search, imported on first use (it pulls in requests and bs4)."""
+    from googlesearch import search
+    return search(*args, **kwargs)
+
+
+def load_search_backend() -> None:
+    """Import the Google search client ahead of the first search (see app.warmup)."""
+    if _search_backend is google_search:
+        import googlesearch  # noqa: F401
+
+
+# Blocking function with googlesearch.search's signature that returns result URLs
+_search_backend: Callable[..., Any] = google_search
+
+
+def set_search_backend(backend: Optional[Callable[..., Any]]) -> None:
+    """
+    Replace the search provider (e.g. with an offline stand-in for benchmarks).
+    The backend is called like googlesearch.search; None restores Google.
+    """
+    global _search_backend
+    _search_backend = backend or google_search
+
+
+def search_variants(query: str) -> List[str]:
+    """Add price-related keywords to improve results with pricing."""
+    return [
+        f"{query} price",
+        f"{query} buy online",
+        f"{query} shop price",
+        f"{query} specifications price"
+    ]
+
+
+def search_key(search_query: str, region: str, start: int, num: int) -> SearchKey:
+    return (" ".join(search_query.lower().split()), region.lower(), start, num)
+
+
+async def run_search(search_query: str, region: str, start: int, num: int) -> List[str]:
+    """Call the blocking search backend in a thread and cache what it returns."""
+    loop = asyncio.get_running_loop()
+    backend = _search_backend
+    with timed("search"):
+        urls = await loop.run_in_executor(
+            None,
+            lambda: list(backend(
+                search_query,
+                num_results=num,
+                lang="en",
+                region=region,
+                start_num=start,
+                sleep_interval=1  # Add a small delay between requests
+            ))
+        )
+    search_cache.set(search_key(search_query, region, start, num), urls)
+    return urls
+
+
+async def search_urls(search_query: str, region: str, start: int, num: int) -> List[str]:
+    """Return one page of search result URLs, from the cache when possible."""
+    key = search_key(search_query, region, start, num)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+    urls = await _search_flights.do(key, lambda: run_search(search_query, region, start, num))
+    return list(urls)
+
+
+def prefetch_search(search_query: str, region: str, start: int, num: int) -> None:
+    """Start fetching a page of search results in the background, if it is not cached yet."""
+    if not SEARCH_PREFETCH:
+        return
+    key = search_key(search_query, region, start, num)
+    if search_cache.has_fresh(key):
+        return
+    search_cache.prefetched += 1
+    task = asyncio.ensure_future(_search_flights.do(key, lambda: run_search(search_query, region, start, num)))
+    _prefetches.add(task)
+    task.add_done_callback(_prefetch_done)
+
+
+def _prefetch_done(task: asyncio.Future) -> None:
+    _prefetches.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Search prefetch failed: {task.exception()}")
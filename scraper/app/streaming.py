@@ -0,0 +1,149 @@
+"""Streaming page download that stops as soon as the product data has arrived."""
+import codecs
+from html.parser import HTMLParser
+from typing import Optional, Tuple
+
+import httpx
+
+from app.config import STREAM_EARLY_STOP, STREAM_MAX_BODY_BYTES, STREAM_SNIFF_BYTES, STREAM_DRAIN_BYTES
+from app.extraction import META_MAPPINGS, load_json_ld, structured_product, safe_float
+
+
+class ProductHeadSniffer(HTMLParser):
+    """
+    Incremental parser fed with page chunks as they arrive.
+    Watches <title>, the og:/product: meta tags and JSON-LD scripts, and reports
+    when title, price and image are all resolved so the download can stop.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title: Optional[str] = None
+        self.price: Optional[float] = None
+        self.image: Optional[str] = None
+        self._in_title = False
+        self._json_ld: Optional[list] = None
+        self.past_head = False
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.title and self.price and self.image)
+
+    @property
+    def hopeless(self) -> bool:
+        """The <head> is over without a price or image; the body is left to the full parse."""
+        return self.past_head and not (self.price or self.image)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "body":
+            self.past_head = True
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            key = META_MAPPINGS.get(attrs.get("property") or attrs.get("name") or "")
+            content = attrs.get("content")
+            if key and content:
+                self._found(key, content)
+        elif tag == "script" and (dict(attrs).get("type") or "").lower() == "application/ld+json":
+            self._json_ld = []
+
+    def handle_endtag(self, tag):
+        if tag == "head":
+            self.past_head = True
+        if tag == "title":
+            self._in_title = False
+        elif tag == "script" and self._json_ld is not None:
+            self._read_json_ld("".join(self._json_ld))
+            self._json_ld = None
+
+    def handle_data(self, data):
+        if self._json_ld is not None:
+            self._json_ld.append(data)
+        elif self._in_title and not self.title and data.strip():
+            self.title = data.strip()
+
+    def _read_json_ld(self, raw: str):
+        data = load_json_ld(raw)
+        for item in data if isinstance(data, list) else [data]:
+            if not isinstance(item, dict):
+                continue
+            for entry in [item] + [n for n in item.get("@graph") or [] if isinstance(n, dict)]:
+                product = structured_product(entry)
+                if product:
+                    for key in ("title", "price", "image"):
+                        if product.get(key):
+                            self._found(key, product[key])
+                    return
+
+    def _found(self, key: str, value):
+        if key == "price":
+            self.price = self.price or safe_float(value)
+        elif key == "title":
+            self.title = self.title or value
+        elif key == "image":
+            self.image = self.image or value
+
+
+async def read_body(response: httpx.Response, early_stop: bool = STREAM_EARLY_STOP,
+                    max_bytes: int = STREAM_MAX_BODY_BYTES,
+                    sniff_bytes: int = STREAM_SNIFF_BYTES,
+                    drain_bytes: int = STREAM_DRAIN_BYTES) -> Tuple[bytes, bool]:
+    """
+    Read a streamed response body chunk by chunk.
+    Stops once the sniffer has title, price and image (when early_stop is on) or
+    when max_bytes have been read. The sniffer only sees the first sniff_bytes, and
+    is dropped early when the <head> ends without product data.
+    Stopping early closes the connection, so when no more than drain_bytes are left
+    the rest is read instead and the connection goes back to the pool.
+    Returns the bytes read and whether the body is complete.
+    """
+    chunks = []
+    size = 0
+    # Once draining, the size the body may reach before giving up on the connection
+    drain_limit = None
+    sniffer = ProductHeadSniffer() if early_stop else None
+    # Sniffing only looks at ASCII markup, so a wrong guess at the charset is harmless
+    decoder = codecs.getincrementaldecoder(
+        lookup_codec(response.charset_encoding) or "utf-8")(errors="replace")
+
+    async for chunk in response.aiter_bytes():
+        if size + len(chunk) > max_bytes:
+            chunks.append(chunk[:max_bytes - size])
+            print(f"Page body over {max_bytes} bytes, truncated: {response.url}")
+            return b"".join(chunks), False
+        chunks.append(chunk)
+        size += len(chunk)
+        if drain_limit is not None and size > drain_limit:
+            return b"".join(chunks), False
+        if sniffer is not None:
+            sniffer.feed(decoder.decode(chunk))
+            if sniffer.complete:
+                remaining = remaining_bytes(response)
+                if remaining is not None and remaining > drain_bytes:
+                    return b"".join(chunks), False
+                drain_limit = size + drain_bytes
+                sniffer = None
+            elif sniffer.hopeless or size >= sniff_bytes:
+                sniffer = None
+    return b"".join(chunks), True
+
+
+def remaining_bytes(response: httpx.Response) -> Optional[int]:
+    """Bytes of the body still on the wire, from Content-Length; None if the length is unknown."""
+    try:
+        length = int(response.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+    return max(length - response.num_bytes_downloaded, 0)
+
+
+def lookup_codec(name: Optional[str]) -> Optional[str]:
+    """Return name if Python knows the codec, else None."""
+    if not name:
+        return None
+    try:
+        codecs.lookup(name)
+    except LookupError:
+        return None
+    return name
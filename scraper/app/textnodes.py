@@ -0,0 +1,75 @@
+"""Streaming access to the visible text of a parsed page, one text node at a time."""
+import re
+from typing import Iterator
+
+# Elements whose content is never visible text
+SKIP_TAGS = {"script", "style", "template", "noscript", "svg", "iframe", "object"}
+
+# Inline styles that hide an element
+HIDDEN_STYLE_REGEX = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+
+# Characters of text per window handed to the scanners
+TEXT_WINDOW_CHARS = 16 * 1024
+
+
+def is_hidden(tag) -> bool:
+    # aria-hidden only hides from screen readers; shops often put the visible price in one
+    if tag.has_attr("hidden"):
+        return True
+    style = tag.get("style")
+    return bool(style and HIDDEN_STYLE_REGEX.search(style))
+
+
+def iter_text_nodes(root) -> Iterator[str]:
+    """
+    Yield the visible text nodes under `root` in document order, skipping comments,
+    script/style/template/noscript content and elements hidden with the hidden
+    attribute or an inline display:none/visibility:hidden style.
+    """
+    # bs4 is imported lazily (see app.extraction)
+    from bs4 import CData, NavigableString, Tag
+
+    stack = [iter(root.contents)]
+    while stack:
+        for node in stack[-1]:
+            if isinstance(node, Tag):
+                if node.name in SKIP_TAGS or is_hidden(node):
+                    continue
+                stack.append(iter(node.contents))
+                break
+            # Comments, doctypes and script/style strings are NavigableString subclasses
+            if type(node) is NavigableString or type(node) is CData:
+                yield str(node)
+        else:
+            stack.pop()
+
+
+def iter_text_windows(root, size: int = TEXT_WINDOW_CHARS, separator: str = " ") -> Iterator[str]:
+    """
+    Yield the visible text in windows of about `size` characters. Windows only break
+    between text nodes, and the nodes are joined with `separator` as get_text() would,
+    so a word never spans two windows.
+    """
+    parts = []
+    length = 0
+    for text in iter_text_nodes(root):
+        parts.append(text)
+        length += len(text) + len(separator)
+        if length >= size:
+            yield separator.join(parts)
+            parts = []
+            length = 0
+    if parts:
+        yield separator.join(parts)
+
+
+def text_prefix(root, limit: int) -> str:
+    """The first `limit` characters of the visible text, without reading the rest of the tree."""
+    parts = []
+    length = 0
+    for text in iter_text_nodes(root):
+        parts.append(text)
+        length += len(text)
+        if length >= limit:
+            break
+    return "".join(parts)[:limit]
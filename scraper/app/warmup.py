@@ -0,0 +1,19 @@
+"""Optional warm-up after startup for the libraries that are imported lazily."""
+import asyncio
+import time
+
+from app.executor import warm_up_executor
+from app.search import load_search_backend
+
+
+async def warm_up() -> None:
+    """Import the search client and the parser stack (in every extraction worker) ahead of traffic."""
+    started = time.perf_counter()
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, load_search_backend)
+        await warm_up_executor()
+    except Exception as e:
+        # A failed warm-up only means the first requests load things themselves
+        print(f"Warm-up failed: {e}")
+        return
+    print(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,271 @@
+"""
+Offline benchmarks for the scraper hot paths.
+
+Run from the scraper directory:
+
+    python -m benchmarks.run                                  # every suite
+    python -m benchmarks.run --suite extract --iterations 500
+    python -m benchmarks.run --suite scrape --latency 50 --failure-rate 0.05 --page-kb 512
+    python -m benchmarks.run --suite startup --startup-runs 10
+    python -m benchmarks.run --compare benchmarks/results/20260101-120000.json
+
+Pages come from benchmarks/corpus and are served by a local stand-in server, and
+searches use a stand-in backend, so no network access is needed. Each run is saved
+to benchmarks/results/<timestamp>.json; --compare prints the change against an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Any
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+SUITES = ("extract", "scrape", "search", "startup")
+
+
+def configure_environment(args) -> None:
+    """
+    Settings that must be in place before the app modules are imported:
+    no result cache (every scrape downloads and parses), no per-host pacing
+    against the single local host, and no proxy for 127.0.0.1.
+    Anything already set in the environment wins.
+    """
+    os.environ.setdefault("SCRAPER_CACHE", "0")
+    os.environ.setdefault("SCRAPER_SEARCH_CACHE_TTL", "0")
+    os.environ.setdefault("SCRAPER_HOST_RATE", "1000000")
+    os.environ.setdefault("SCRAPER_HOST_BURST", "1000000")
+    os.environ.setdefault("SCRAPER_HTTP_MAX_CONNECTIONS_PER_HOST", str(args.concurrency))
+    os.environ.setdefault("SCRAPER_HOST_MAX_RETRIES", "0")
+    os.environ.setdefault("NO_PROXY", "127.0.0.1,localhost")
+    # Keep runs independent: no product index answering searches, no background monitor
+    os.environ.setdefault("SCRAPER_INDEX", "0")
+    os.environ.setdefault("SCRAPER_MONITOR", "0")
+
+
+def peak_rss_mb() -> float:
+    """
+    Peak resident set size of this process and its worker processes so far. This is
+    ru_maxrss, a running maximum over the whole run: a row shows the highest RSS seen up
+    to the end of its benchmark, not that benchmark's own peak.
+    """
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / scale, 1)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies: List[float], elapsed: float, **extra) -> Dict[str, Any]:
+    """Throughput and latency percentiles (milliseconds) for one benchmark."""
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "throughput": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+        "peak_rss_mb": peak_rss_mb(),
+        **extra,
+    }
+
+
+def time_calls(fn: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def uncached(page):
+    """Drop what the page caches between steps (the price scan), so every call pays for it."""
+    page.__dict__.pop("price_scan", None)
+    return page
+
+
+def bench_extract(args, server) -> Dict[str, Dict[str, Any]]:
+    """Parse and every extraction step, per corpus variant, with no I/O."""
+    from app import extraction
+
+    steps = {
+        "extract_structured_data": extraction.extract_structured_data,
+        "extract_meta_tags": extraction.extract_meta_tags,
+        "extract_price_from_dom": extraction.extract_price_from_dom,
+        "extract_images": extraction.extract_images,
+        "extract_description": extraction.extract_description,
+    }
+    results = {}
+    for variant, html in server.pages.items():
+        url = server.url_for(variant, 1)
+        results[f"extract/{variant}/parse"] = time_calls(lambda: extraction.ParsedPage(html, url), args.iterations)
+        page = extraction.ParsedPage(html, url)
+        for name, step in steps.items():
+            results[f"extract/{variant}/{name}"] = time_calls(lambda: step(uncached(page)), args.iterations)
+        results[f"extract/{variant}/extract_product"] = time_calls(
+            lambda: extraction.extract_product(html, url), args.iterations)
+    return results
+
+
+async def bench_scrape(args, server) -> Dict[str, Dict[str, Any]]:
+    """scrape_product end to end (fetch, stream, parse, extract) against the stand-in server."""
+    from app.scraper import scrape_product
+
+    slots = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    outcomes = {"success": 0, "failure": 0}
+
+    async def one(n: int):
+        url = server.url_for(server.variants[n % len(server.variants)], 10_000_000 + n)
+        async with slots:
+            t = time.perf_counter()
+            result = await scrape_product(url)
+            latencies.append(time.perf_counter() - t)
+        outcomes["success" if result.get("success") else "failure"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(args.iterations)))
+    return {"scrape/scrape_product": summarize(latencies, time.perf_counter() - started, **outcomes)}
+
+
+async def bench_search(args, server) -> Dict[str, Dict[str, Any]]:
+    """search_google_and_scrape with the stand-in search backend, one query at a time."""
+    from app.scraper import search_google_and_scrape
+
+    latencies = []
+    found = 0
+    started = time.perf_counter()
+    for n in range(args.searches):
+        t = time.perf_counter()
+        response = await search_google_and_scrape(f"benchmark product {n}", args.num_results, "com")
+        latencies.append(time.perf_counter() - t)
+        found += len(response["results"])
+    return {"search/search_google_and_scrape": summarize(
+        latencies, time.perf_counter() - started, products=found, stand_in_requests=server.requests)}
+
+
+async def run_network_suites(args, server) -> Dict[str, Dict[str, Any]]:
+    from app import http_client, executor, search
+
+    search.set_search_backend(server.search_backend)
+    await http_client.start_client()
+    executor.start_executor()
+    results = {}
+    try:
+        if "scrape" in args.suite:
+            results.update(await bench_scrape(args, server))
+        if "search" in args.suite:
+            results.update(await bench_search(args, server))
+    finally:
+        executor.shutdown_executor()
+        await http_client.close_client()
+        search.set_search_backend(None)
+    return results
+
+
+def print_table(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'benchmark':<58} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max rss':>8}")
+    for name, r in results.items():
+        print(f"{name:<58} {r['throughput']:>10} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['peak_rss_mb']:>8}")
+    print("max rss: highest RSS of the run so far in MB (ru_maxrss), not the peak of that row alone")
+
+
+def print_comparison(results: Dict[str, Dict[str, Any]], baseline_path: str) -> None:
+    """Show the change in throughput and latency against an earlier saved run."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nCompared with {baseline_path}")
+    print(f"{'benchmark':<58} {'ops/s':>10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, r in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        print(f"{name:<58} {change(r['throughput'], old['throughput']):>10} "
+              f"{change(r['p50_ms'], old['p50_ms']):>9} {change(r['p95_ms'], old['p95_ms']):>9} "
+              f"{change(r['p99_ms'], old['p99_ms']):>9}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks")
+    parser.add_argument("--suite", action="append", choices=SUITES,
+                        help="suite to run (repeatable); default runs all")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per extract step / pages per scrape run")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent scrapes in the scrape suite")
+    parser.add_argument("--searches", type=int, default=10, help="searches in the search suite")
+    parser.add_argument("--num-results", type=int, default=5, help="num_results per search")
+    parser.add_argument("--latency", type=float, default=0.0, help="stand-in server latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in ms")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of pages answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of pages answered with 429")
+    parser.add_argument("--page-kb", type=int, default=0, help="pad every page to this size in KiB")
+    parser.add_argument("--startup-runs", type=int, default=5, help="fresh interpreters in the startup suite")
+    parser.add_argument("--output", default=RESULTS_DIR, help="directory for the JSON results")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+    args.suite = args.suite or list(SUITES)
+
+    configure_environment(args)
+    from benchmarks.server import StandInServer
+    from benchmarks.startup import bench_startup
+    from app.extraction import resolve_parser
+    from app.config import EXTRACTION_EXECUTOR
+
+    server = StandInServer(latency=args.latency / 1000, jitter=args.jitter / 1000,
+                           failure_rate=args.failure_rate, throttle_rate=args.throttle_rate,
+                           page_size=args.page_kb * 1024)
+    server.start()
+    try:
+        results = {}
+        if "extract" in args.suite:
+            results.update(bench_extract(args, server))
+        if "scrape" in args.suite or "search" in args.suite:
+            results.update(asyncio.run(run_network_suites(args, server)))
+        if "startup" in args.suite:
+            results.update(bench_startup(args, summarize))
+    finally:
+        server.stop()
+
+    print_table(results)
+    run = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser": resolve_parser(),
+            "executor": EXTRACTION_EXECUTOR,
+        },
+        "results": results,
+    }
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"\nSaved {path}")
+
+    if args.compare:
+        print_comparison(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Local stand-in for retailer sites and the search provider, replaying the recorded corpus."""
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Markup used to pad pages up to a target size, like the long related-product lists on real shops
+FILLER_ITEM = (
+    '<li class="product-card"><a href="/p/item-{n}"><img src="/img/thumb-{n}.jpg" width="80" height="80"'
+    ' alt="Item {n}"></a><span class="name">Accessory item {n}</span><span class="rating">4.{d} stars</span></li>\n'
+)
+
+# The product price as written in each corpus page; the stand-in varies it per page id
+PRODUCT_PRICES = {
+    "dom_price": b"109.99",
+    "jsonld": b"829.99",
+    "meta_only": b"124,999",
+    "microdata": b"299.00",
+}
+
+
+class BenchmarkHTTPServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer with a listen backlog deep enough for the benchmark's concurrency;
+    the default of 5 overflows at --concurrency 20 and adds 1 s SYN retransmits to the tail.
+    """
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def load_corpus() -> Dict[str, bytes]:
+    """Read every recorded page, keyed by its variant name (file name without .html)."""
+    pages = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, name), "rb") as f:
+                pages[name[:-5]] = f.read()
+    return pages
+
+
+def page_for_id(variant: str, html: bytes, n: int) -> bytes:
+    """
+    Give page `n` its own product: the price is raised in 5% steps by id (wider than
+    the search's near-duplicate tolerance) and the id is added to the <title>, so
+    search results aren't collapsed as one product listed on many pages.
+    """
+    html = html.replace(b"<title>", f"<title>#{n} ".encode(), 1)
+    price = PRODUCT_PRICES.get(variant)
+    if price is None:
+        return html
+    text = price.decode()
+    decimals = len(text.split(".")[1]) if "." in text else 0
+    value = float(text.replace(",", "")) * (1 + 0.05 * (n % 500))
+    new_price = f"{value:,.{decimals}f}" if "," in text else f"{value:.{decimals}f}"
+    return html.replace(price, new_price.encode())
+
+
+def pad_page(html: bytes, size: int) -> bytes:
+    """Grow a page to roughly `size` bytes by inserting filler before </body>."""
+    if size <= len(html):
+        return html
+    items = []
+    total = len(html)
+    n = 0
+    while total < size:
+        item = FILLER_ITEM.format(n=n, d=n % 10).encode()
+        items.append(item)
+        total += len(item)
+        n += 1
+    filler = b'<ul class="more-products">\n' + b"".join(items) + b"</ul>\n"
+    head, sep, tail = html.rpartition(b"</body>")
+    return head + filler + sep + tail if sep else html + filler
+
+
+class StandInServer:
+    """
+    Threaded HTTP server that serves corpus pages at /p/<variant>/<id>.
+    Latency, jitter, failure rate, 429 rate and page size are configurable, and
+    search_backend() plays the search provider by returning URLs on this server.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 throttle_rate: float = 0.0, page_size: int = 0, seed: int = 0,
+                 variants: Optional[List[str]] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.pages = {name: pad_page(html, page_size) for name, html in load_corpus().items()}
+        self.variants = variants or list(self.pages)
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.base_url = ""
+
+    def start(self) -> str:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = BenchmarkHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.base_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def url_for(self, variant: str, n: int) -> str:
+        return f"{self.base_url}/p/{variant}/{n}"
+
+    def handle(self, request: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            delay = self.latency + self._random.random() * self.jitter
+        if delay:
+            time.sleep(delay)
+
+        parts = request.path.split("?")[0].strip("/").split("/")
+        if len(parts) != 3 or parts[0] != "p" or parts[1] not in self.pages:
+            return self.respond(request, 404, b"not found")
+        if roll < self.failure_rate:
+            return self.respond(request, 500, b"stand-in failure")
+        if roll < self.failure_rate + self.throttle_rate:
+            return self.respond(request, 429, b"slow down", {"Retry-After": "0"})
+        try:
+            html = page_for_id(parts[1], self.pages[parts[1]], int(parts[2]))
+        except ValueError:
+            return self.respond(request, 404, b"not found")
+        self.respond(request, 200, html, {"Content-Type": "text/html; charset=utf-8"})
+
+    @staticmethod
+    def respond(request: BaseHTTPRequestHandler, status: int, body: bytes,
+                headers: Optional[Dict[str, str]] = None) -> None:
+        request.send_response(status)
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def search_backend(self, term: str, num_results: int = 10, start_num: int = 0, **kwargs) -> List[str]:
+        """Stand-in for googlesearch.search: a stable, distinct list of corpus URLs per query and offset."""
+        seed = zlib.crc32(term.encode()) % 100000 * 1000
+        return [
+            self.url_for(self.variants[(seed + start_num + i) % len(self.variants)], seed + start_num + i)
+            for i in range(num_results)
+        ]
@@ -0,0 +1,74 @@
+"""Cold-start benchmark: import time, import memory and first-page cost in fresh interpreters."""
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List
+
+SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that should only be loaded once a page is parsed or a search runs
+HEAVY_MODULES = ["bs4", "lxml", "html5lib", "googlesearch", "requests"]
+
+# Runs in a fresh interpreter; prints one JSON line
+PROBE = """
+import json, resource, sys, time
+KIB = 1024 * 1024 if sys.platform == "darwin" else 1024
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / KIB
+
+baseline = rss_mb()
+t = time.perf_counter()
+import main
+import_seconds = time.perf_counter() - t
+import_rss = rss_mb()
+loaded = [m for m in {heavy!r} if m in sys.modules]
+
+from app.extraction import extract_product
+with open({page!r}, "rb") as f:
+    html = f.read()
+t = time.perf_counter()
+extract_product(html, "http://127.0.0.1/p/1")
+first_seconds = time.perf_counter() - t
+
+print(json.dumps({{
+    "import_seconds": import_seconds,
+    "import_mb": import_rss - baseline,
+    "first_page_seconds": first_seconds,
+    "peak_rss_mb": rss_mb(),
+    "heavy_loaded_at_import": loaded,
+}}))
+"""
+
+
+def probe_once(page_path: str) -> Dict[str, Any]:
+    env = dict(os.environ, SCRAPER_MONITOR="0", SCRAPER_INDEX="0", SCRAPER_WARMUP="0")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY_MODULES, page=page_path)],
+        cwd=SCRAPER_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_startup(args, summarize) -> Dict[str, Dict[str, Any]]:
+    """
+    `import main` and the first extract_product call, each in a new interpreter
+    (the cost a freshly scheduled uvicorn worker pays), repeated args.startup_runs times.
+    """
+    page_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "jsonld.html")
+    runs: List[Dict[str, Any]] = [probe_once(page_path) for _ in range(args.startup_runs)]
+
+    def total(key: str) -> float:
+        return sum(run[key] for run in runs)
+
+    peak = round(max(run["peak_rss_mb"] for run in runs), 1)
+    loaded = sorted({m for run in runs for m in run["heavy_loaded_at_import"]})
+    return {
+        "startup/import_main": summarize(
+            [run["import_seconds"] for run in runs], total("import_seconds"),
+            peak_rss_mb=peak, import_mb=round(total("import_mb") / len(runs), 1),
+            heavy_loaded_at_import=loaded),
+        "startup/first_extract_product": summarize(
+            [run["first_page_seconds"] for run in runs], total("first_page_seconds"), peak_rss_mb=peak),
+    }
@@ -1,30 +1,181 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse, PlainTextResponse
 import httpx
-from app.schemas import ScrapeRequest, ScrapeResponse, GoogleSearchScrapeRequest
-from app.scraper import scrape_product, search_google_and_scrape
+from app.schemas import (
+    ScrapeRequest, ScrapeResponse, GoogleSearchScrapeRequest, BatchScrapeRequest, BatchScrapeResponse,
+    MonitorTrackRequest, MonitorUntrackRequest,
+)
+from app.scraper import (
+    scrape_product, search_google_and_scrape, iter_search_results, scrape_flights, search_flights,
+)
+from app.http_client import start_client, close_client
+from app.executor import start_executor, shutdown_executor, executor_stats
+from app.cache import scrape_cache
+from app.ratelimit import host_scheduler
+from app.search import search_cache
+from app.batch import dedupe_urls, iter_batch, scrape_batch, to_scrape_response
+from app.config import BATCH_MAX_URLS, MONITOR_ENABLED, WARMUP_ENABLED
+from app.profiles import extraction_profiles
+from app.monitor import price_monitor
+from app.index import product_index
+from app.images import image_prober
+from app.warmup import warm_up
+from app.metrics import register_collector, render_metrics, metrics_summary
 
-app = FastAPI(title="Generic Product Scraper API", version="1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled HTTP client for the whole process so connections are reused across requests
+    await start_client()
+    # Worker pool for HTML parsing (no-op in the default "inline" mode)
+    start_executor()
+    # Re-scrape tracked URLs in the background
+    if MONITOR_ENABLED:
+        price_monitor.start()
+    # Heavy libraries are imported lazily; load them now without holding up startup
+    warmup = asyncio.create_task(warm_up()) if WARMUP_ENABLED else None
+    yield
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    await price_monitor.stop()
+    shutdown_executor()
+    scrape_cache.close()
+    product_index.close()
+    host_scheduler.reset()
+    await close_client()
+
+app = FastAPI(title="Generic Product Scraper API", version="1.0", lifespan=lifespan)
 
 @app.post("/search-and-scrape", tags=["Google Search & Scrape"])
 async def search_and_scrape(request: GoogleSearchScrapeRequest):
     try:
-        results = await search_google_and_scrape(request.query, request.num_results, request.country_code)
+        results = await search_google_and_scrape(
+            request.query, request.num_results, request.country_code, request.mode)
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Error: {str(e)}")
 
+@app.post("/search-and-scrape/stream", tags=["Google Search & Scrape"])
+async def search_and_scrape_stream(request: GoogleSearchScrapeRequest):
+    """Stream each complete product as one NDJSON line as soon as it is scraped."""
+    async def ndjson_lines():
+        try:
+            async for result in iter_search_results(
+                    request.query, request.num_results, request.country_code, request.mode):
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            yield json.dumps({"success": False, "error": f"Internal Error: {str(e)}"}) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @app.get("/", tags=["Root"])
 async def root():
     return {"message": "Welcome to the Generic Scraper API 🚀"}
 
+@app.get("/stats", tags=["Monitoring"])
+async def stats():
+    return {
+        "cache": scrape_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "executor": executor_stats(),
+        "fetch": host_scheduler.stats(),
+        "profiles": extraction_profiles.stats(),
+        "monitor": await asyncio.get_running_loop().run_in_executor(None, price_monitor.stats),
+        "index": await asyncio.get_running_loop().run_in_executor(None, product_index.stats),
+        "image_probe": image_prober.stats(),
+        "timings": metrics_summary(),
+        "coalescing": {
+            "scrape": scrape_flights.stats(),
+            "search": search_flights.stats(),
+        },
+    }
+
+# Counters kept by the cache, search cache and executor, exposed as-is on /metrics
+register_collector(
+    "scraper_cache_lookups_total", "Scrape result cache lookups by outcome.", "counter",
+    lambda: {(("outcome", outcome),): scrape_cache.stats()[outcome]
+             for outcome in ("memory_hits", "disk_hits", "misses")},
+)
+register_collector(
+    "scraper_cache_hit_ratio", "Share of scrape cache lookups answered from the cache.", "gauge",
+    lambda: {(): scrape_cache.stats()["hit_rate"]},
+)
+register_collector(
+    "scraper_cache_revalidations_total", "Conditional re-scrapes by outcome.", "counter",
+    lambda: {(("outcome", outcome),): count for outcome, count in scrape_cache.stats()["revalidations"].items()},
+)
+register_collector(
+    "scraper_search_cache_lookups_total", "Search result cache lookups by outcome.", "counter",
+    lambda: {(("outcome", outcome),): search_cache.stats()[outcome] for outcome in ("hits", "misses")},
+)
+register_collector(
+    "scraper_extraction_pages", "Pages parsing or waiting for an extraction slot.", "gauge",
+    lambda: {(("state", state),): executor_stats()[state] for state in ("in_flight", "waiting")},
+)
+
+@app.get("/metrics", tags=["Monitoring"], response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the stage timings and counters."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.post("/scrape", response_model=ScrapeResponse)
 async def scrape(request: ScrapeRequest):
     try:
-        result = await scrape_product(request.url)
+        result = await scrape_product(request.url, refresh=request.refresh)
         if not result.get("price") or not result.get("title"):
             raise HTTPException(status_code=404, detail="Product info not found")
-        return result
+        return to_scrape_response(result)
+    except HTTPException:
+        raise
     except httpx.HTTPStatusError as e:
         raise HTTPException(status_code=e.response.status_code, detail=f"HTTP Error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal Error: {str(e)}")
+
+def check_batch_size(request: BatchScrapeRequest):
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="At least one URL is required")
+    if len(request.urls) > BATCH_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_URLS} URLs per batch")
+
+@app.post("/scrape/batch", response_model=BatchScrapeResponse)
+async def batch_scrape(request: BatchScrapeRequest):
+    """Scrape many URLs in one call. Each entry reports its own success or error."""
+    check_batch_size(request)
+    return await scrape_batch(request.urls, refresh=request.refresh)
+
+@app.post("/scrape/batch/stream")
+async def batch_scrape_stream(request: BatchScrapeRequest):
+    """Stream one NDJSON line per unique URL, in completion order; `indices` map it back to the request."""
+    check_batch_size(request)
+
+    async def ndjson_lines():
+        try:
+            async for item in iter_batch(dedupe_urls(request.urls), refresh=request.refresh):
+                yield json.dumps(item) + "\n"
+        except Exception as e:
+            yield json.dumps({"success": False, "error": f"Internal Error: {str(e)}"}) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.post("/monitor/track", tags=["Price Monitoring"])
+async def monitor_track(request: MonitorTrackRequest):
+    """Track URLs for background price checks (re-tracking a URL updates its interval)."""
+    loop = asyncio.get_running_loop()
+    return {"tracked": await loop.run_in_executor(None, price_monitor.track, request.urls, request.interval)}
+
+@app.post("/monitor/untrack", tags=["Price Monitoring"])
+async def monitor_untrack(request: MonitorUntrackRequest):
+    return {"untracked": await asyncio.get_running_loop().run_in_executor(None, price_monitor.untrack, request.urls)}
+
+@app.get("/monitor/tracked", tags=["Price Monitoring"])
+async def monitor_tracked(limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0)):
+    return {"results": await asyncio.get_running_loop().run_in_executor(None, price_monitor.tracked, limit, offset)}
+
+@app.get("/monitor/changes", tags=["Price Monitoring"])
+async def monitor_changes(since: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    """Price changes after the change id `since`; pass the last id you saw to poll for new ones."""
+    changes = await asyncio.get_running_loop().run_in_executor(None, price_monitor.changes, since, limit)
+    return {"results": changes, "last_id": changes[-1]["id"] if changes else since}
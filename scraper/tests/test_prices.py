@@ -0,0 +1,54 @@
+import pytest
+
+from app.prices import PriceScan
+
+
+@pytest.mark.parametrize("text, value, currency", [
+    ("Rs. 24,999", 24999.0, "PKR"),
+    ("Rs.24,999", 24999.0, "PKR"),
+    ("Rs 24,999", 24999.0, "PKR"),
+    ("$ 1,299.50", 1299.5, "USD"),
+    ("$1,299", 1299.0, "USD"),
+])
+def test_prefixed_currency(text, value, currency):
+    candidate = PriceScan(text).first_currency_price(50)
+    assert candidate is not None
+    assert (candidate.value, candidate.currency, candidate.prefixed) == (value, currency, True)
+
+
+def test_suffix_currency():
+    candidate = PriceScan("Our offer: 24,999 PKR only").best()
+    assert (candidate.value, candidate.currency, candidate.prefixed) == (24999.0, "PKR", False)
+
+
+def test_low_price_fallback_skips_discounts():
+    scan = PriceScan("Price: Rs. 20 off! Rs. 24,999")
+    assert scan.best().value == 20.0
+    assert scan.first_currency_price(50).value == 24999.0
+
+
+def test_best_prefers_strongest_keyword():
+    scan = PriceScan("Buy 3 for $10. Price: $1,299. Total $1,350")
+    assert scan.best().value == 1299.0
+
+
+def test_unlabelled_amounts_are_ignored():
+    assert PriceScan("Model 4500 with 16 GB").best() is None
+
+
+def test_page_currency_priority():
+    assert PriceScan("Rs. 100 or € 2 or $ 5").page_currency() == "USD"
+    assert PriceScan("about 5 pkr").page_currency() == "PKR"
+    assert PriceScan("no money here").page_currency() is None
+
+
+def test_windows_match_whole_text():
+    text = "Shipping 5 days. Price: Rs. 24,999 and 1,200 PKR extra"
+    windows = ["Shipping 5 days.", "Price: Rs.", "24,999 and 1,200", "PKR extra"]
+    whole, split = PriceScan(text), PriceScan(iter(windows))
+    for scan in (whole, split):
+        assert (scan.best().value, scan.best().currency) == (24999.0, "PKR")
+        assert scan.first_currency_price(50).value == 24999.0
+    split.page_currency()
+    assert [(c.value, c.currency, c.prefixed) for c in split.candidates] == \
+        [(c.value, c.currency, c.prefixed) for c in whole.candidates]
@@ -1,6 +1,7 @@
 const express = require('express');
 const router = express.Router();
 const axios = require('axios');
+const { pipeline } = require('stream');
 
 // Scraper API base URL
 const SCRAPER_API_URL = process.env.SCRAPER_API_URL || 'http://localhost:8000';
@@ -8,12 +9,13 @@ const SCRAPER_API_URL = process.env.SCRAPER_API_URL || 'http://localhost:8000';
 // Proxy route for search-and-scrape
 router.post('/search-and-scrape', async (req, res) => {
   try {
-    const { query, num_results, country_code } = req.body;
+    const { query, num_results, country_code, mode } = req.body;
 
     const response = await axios.post(`${SCRAPER_API_URL}/search-and-scrape`, {
       query,
       num_results: num_results || 5,
-      country_code: country_code || 'com'
+      country_code: country_code || 'com',
+      mode: mode || 'auto'
     });
 
     // Log the response structure for debugging
@@ -77,6 +79,36 @@ router.post('/search-and-scrape', async (req, res) => {
   }
 });
 
+// Proxy route for streamed search-and-scrape (NDJSON, one product per line)
+router.post('/search-and-scrape/stream', async (req, res) => {
+  try {
+    const { query, num_results, country_code, mode } = req.body;
+
+    const response = await axios.post(`${SCRAPER_API_URL}/search-and-scrape/stream`, {
+      query,
+      num_results: num_results || 5,
+      country_code: country_code || 'com',
+      mode: mode || 'auto'
+    }, { responseType: 'stream' });
+
+    res.setHeader('Content-Type', 'application/x-ndjson');
+    pipeline(response.data, res, (err) => {
+      if (err) console.error('Scraper stream ended early:', err.message);
+    });
+
+    // Stop the upstream scrape if the client goes away
+    res.on('close', () => response.data.destroy());
+  } catch (error) {
+    console.error('Error in scraper stream proxy:', error.message);
+
+    res.status(error.response?.status || 500).json({
+      success: false,
+      message: error.message,
+      error: 'Internal server error'
+    });
+  }
+});
+
 // Proxy route for scrape
 router.post('/scrape', async (req, res) => {
   try {
@@ -120,4 +152,65 @@ router.post('/scrape', async (req, res) => {
   }
 });
 
+// Proxy route for batch scrape (per-URL success or error in one response)
+router.post('/scrape/batch', async (req, res) => {
+  try {
+    const { urls, refresh } = req.body;
+
+    if (!Array.isArray(urls) || urls.length === 0) {
+      return res.status(400).json({
+        success: false,
+        message: 'A non-empty urls array is required'
+      });
+    }
+
+    const response = await axios.post(`${SCRAPER_API_URL}/scrape/batch`, { urls, refresh: !!refresh });
+
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error in scraper batch proxy:', error.message);
+
+    res.status(error.response?.status || 500).json({
+      success: false,
+      message: error.message,
+      error: error.response?.data || 'Internal server error'
+    });
+  }
+});
+
+// Proxy route for streamed batch scrape (NDJSON, one URL per line in completion order)
+router.post('/scrape/batch/stream', async (req, res) => {
+  try {
+    const { urls, refresh } = req.body;
+
+    if (!Array.isArray(urls) || urls.length === 0) {
+      return res.status(400).json({
+        success: false,
+        message: 'A non-empty urls array is required'
+      });
+    }
+
+    const response = await axios.post(`${SCRAPER_API_URL}/scrape/batch/stream`, {
+      urls,
+      refresh: !!refresh
+    }, { responseType: 'stream' });
+
+    res.setHeader('Content-Type', 'application/x-ndjson');
+    pipeline(response.data, res, (err) => {
+      if (err) console.error('Scraper batch stream ended early:', err.message);
+    });
+
+    // Stop the upstream scrapes if the client goes away
+    res.on('close', () => response.data.destroy());
+  } catch (error) {
+    console.error('Error in scraper batch stream proxy:', error.message);
+
+    res.status(error.response?.status || 500).json({
+      success: false,
+      message: error.message,
+      error: 'Internal server error'
+    });
+  }
+});
+
 module.exports = router;